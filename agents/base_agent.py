@@ -1,9 +1,29 @@
 import logging
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy.orm import Session
 from database.models import SessionLocal
-from database.crud import update_paper_status, PaperStatus
+from database.crud import update_paper_status, update_papers_status_bulk, PaperStatus
 
 logger = logging.getLogger(__name__)
 
+@contextmanager
+def unit_of_work() -> Iterator[Session]:
+    """
+    Yields a session whose writes all land in one transaction. Crud helpers called inside the
+    block are passed commit=False so they only flush; the session is committed once when the
+    block exits (or rolled back if it raises).
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 class BaseAgent:
     """Base class for all agents to provide common functionalities."""
     def __init__(self):
@@ -11,6 +31,10 @@ class BaseAgent:
         # direct use of SessionLocal or LLMService instances might be simpler.
         pass
 
+    def unit_of_work(self):
+        """Batches all database writes of a task into a single transaction."""
+        return unit_of_work()
+
     def _update_paper_status(self, paper_id: int, status: PaperStatus):
         """Helper to update a paper's status in the database."""
         try:
@@ -18,4 +42,13 @@ class BaseAgent:
                 update_paper_status(db, paper_id, status)
                 logger.info(f"Paper {paper_id} status updated to {status.value}")
         except Exception as e:
-            logger.error(f"Failed to update status for paper {paper_id} to {status.value}: {e}")
\ No newline at end of file
+            logger.error(f"Failed to update status for paper {paper_id} to {status.value}: {e}")
+
+    def _update_papers_status(self, paper_ids: List[int], status: PaperStatus):
+        """Helper to move many papers to the same status with one UPDATE per batch of IDs."""
+        try:
+            with SessionLocal() as db:
+                updated = update_papers_status_bulk(db, paper_ids, status)
+                logger.info(f"{updated} papers status updated to {status.value}")
+        except Exception as e:
+            logger.error(f"Failed to update status for papers {paper_ids} to {status.value}: {e}")
\ No newline at end of file
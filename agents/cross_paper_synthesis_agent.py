@@ -1,6 +1,7 @@
+import json
 import logging
 import os
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from celery import shared_task
 
 import sys
@@ -11,19 +12,108 @@ from config import settings
 from database.crud import (
     get_topic_by_id, get_paper_by_id, get_extracted_data_by_paper_id,
     create_summary, get_all_topics, get_papers_by_topic,
-    get_summary_by_id # Needed to fetch individual summaries
+    get_summary_by_id, # Needed to fetch individual summaries
+    get_latest_topic_synthesis, get_papers_by_ids, get_individual_summaries_for_papers
 )
 from database.models import SessionLocal, SummaryType, PaperStatus
 from utils.llm_utils import synthesis_llm
-from utils.file_utils import save_text_to_file, generate_unique_filename
+from utils.file_utils import stream_text_to_file, generate_unique_filename
 from utils.citation_manager import get_citations_for_summary
+from utils.embeddings import get_embedder
+from utils.vector_index import rank_by_relevance, SUMMARY_VECTORS
+from utils.prompt_builder import PromptBuilder
+from utils.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
+REFERENCES_SEPARATOR = "\n\n---\n\nReferences:\n"
+SYNTHESIS_MAX_TOKENS = 600
+SYNTHESIS_PROMPT = (
+    "Synthesize the key findings, trends, and common themes from the following research paper summaries "
+    "related to the topic '{topic}'. Identify any conflicting findings or research gaps. "
+    "Provide an overview suitable for a short podcast segment (around 300-500 words).\n\n"
+    "Topic: {topic}\n\n"
+    "Individual Paper Summaries:\n{content}\n\n"
+    "Cross-Paper Synthesis:"
+)
+INCREMENTAL_SYNTHESIS_PROMPT = (
+    "Below is an existing synthesis of research on the topic '{topic}', followed by summaries "
+    "of newly added papers. Update the synthesis so it integrates the new findings, trends and themes, "
+    "noting where they confirm, extend or conflict with the existing picture and any research gaps. "
+    "Keep it suitable for a short podcast segment (around 300-500 words).\n\n"
+    "Topic: {topic}\n\n"
+    "Existing Synthesis:\n{previous_synthesis}\n\n"
+    "New Paper Summaries:\n{content}\n\n"
+    "Updated Cross-Paper Synthesis:"
+)
+
+def _order_by_similarity(items: List[Tuple[str, List[int]]]) -> List[Tuple[str, List[int]]]:
+    """
+    Orders (summary, paper_ids) items so that similar papers are adjacent (greedy nearest-neighbour
+    walk over their embeddings). Consecutive groups of the result then form clusters of related papers.
+    """
+    if len(items) < 3:
+        return list(items)
+    vectors = get_embedder().encode([text for text, _ in items])
+    similarities = vectors @ vectors.T
+    remaining = set(range(1, len(items)))
+    order = [0]
+    while remaining:
+        current = order[-1]
+        next_index = max(remaining, key=lambda i: similarities[current, i])
+        remaining.remove(next_index)
+        order.append(next_index)
+    return [items[i] for i in order]
+
+def _group_by_token_budget(items: List[Tuple[str, List[int]]], max_tokens: int) -> List[List[Tuple[str, List[int]]]]:
+    groups, current, current_tokens = [], [], 0
+    for item in items:
+        item_tokens = count_tokens(item[0])
+        if current and current_tokens + item_tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += item_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def tree_reduce_summaries(topic_name: str, paper_summaries: List[str], paper_ids: List[int]) -> List[Tuple[str, List[int]]]:
+    """
+    Condenses paper summaries that don't fit in one synthesis prompt: related papers are
+    clustered into groups of at most SYNTHESIS_MAX_INPUT_TOKENS, each cluster is synthesized
+    into an intermediate overview, and the process repeats until everything fits.
+    Returns (summary or overview, IDs of the papers behind it) items; papers whose cluster
+    overview could not be generated are left out.
+    """
+    items = [(summary, [paper_id]) for summary, paper_id in zip(paper_summaries, paper_ids)]
+    while len(items) > 1 and count_tokens("\n\n---\n\n".join(text for text, _ in items)) > settings.SYNTHESIS_MAX_INPUT_TOKENS:
+        groups = _group_by_token_budget(_order_by_similarity(items), settings.SYNTHESIS_MAX_INPUT_TOKENS)
+        if len(groups) >= len(items):
+            break # Individual items are too large to combine further
+        cluster_overviews = []
+        for group in groups:
+            prompt = (
+                f"Combine the following research paper summaries related to the topic '{topic_name}' into one "
+                f"concise overview of their key findings, methods and any conflicting results. "
+                f"Keep paper titles so findings stay attributable (around 200-300 words).\n\n"
+                + "\n\n---\n\n".join(text for text, _ in group) +
+                "\n\nCluster Overview:"
+            )
+            overview = synthesis_llm.generate_text(prompt, max_tokens=450, temperature=0.0)
+            if overview:
+                cluster_overviews.append((overview, [paper_id for _, ids in group for paper_id in ids]))
+        if not cluster_overviews:
+            break
+        items = cluster_overviews
+    return items
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=120)
 def generate_cross_paper_synthesis_task(self, topic_id: int, paper_ids: List[int]) -> Optional[int]:
     """
     Generates a cross-paper synthesis for a given topic based on multiple papers.
+    In incremental mode, only papers not covered by the topic's latest synthesis are folded
+    into it; large sets of summaries are tree-reduced over clusters of related papers.
     Returns the synthesis summary_id on success, None on failure.
     """
     with SessionLocal() as db:
@@ -32,56 +122,99 @@ def generate_cross_paper_synthesis_task(self, topic_id: int, paper_ids: List[int
             logger.error(f"Topic with ID {topic_id} not found for synthesis.")
             return None
 
+        previous_synthesis = None
+        covered_paper_ids = set()
+        if settings.SYNTHESIS_MODE == "incremental":
+            previous_synthesis = get_latest_topic_synthesis(db, topic.id)
+            if previous_synthesis and previous_synthesis.covered_paper_ids_json:
+                covered_paper_ids = set(json.loads(previous_synthesis.covered_paper_ids_json))
+            else:
+                previous_synthesis = None # Legacy syntheses don't record their papers; rebuild from scratch
+
+        new_paper_ids = [p_id for p_id in paper_ids if p_id not in covered_paper_ids]
+        if previous_synthesis and not new_paper_ids:
+            logger.info(f"Synthesis {previous_synthesis.id} for topic '{topic.name}' already covers all papers.")
+            return previous_synthesis.id
+
+        # Papers and their individual summaries are fetched in bulk rather than lazily per paper
+        papers = {p.id: p for p in get_papers_by_ids(db, new_paper_ids)}
+        individual_summaries = get_individual_summaries_for_papers(db, list(papers))
+
         relevant_paper_summaries = []
-        for p_id in paper_ids:
-            paper = get_paper_by_id(db, p_id)
+        included_paper_ids = []
+        for p_id in new_paper_ids:
+            paper = papers.get(p_id)
             if paper and paper.status == PaperStatus.SUMMARIZED: # Ensure paper is summarized
-                # Find the individual summary for this paper
-                individual_summary = next((s for s in paper.summaries if s.summary_type == SummaryType.INDIVIDUAL_PAPER), None)
+                individual_summary = individual_summaries.get(p_id)
                 if individual_summary:
                     relevant_paper_summaries.append(f"Paper: {paper.title} (DOI: {paper.doi or 'N/A'})\nSummary: {individual_summary.content}")
+                    included_paper_ids.append(p_id)
                 else:
                     logger.warning(f"No individual summary found for paper ID {p_id} in topic {topic.name}.")
             else:
                 logger.warning(f"Paper ID {p_id} not summarized or found for topic {topic.name}.")
 
+        # Most relevant summaries first, so they are the ones kept when the top-k or the prompt budget cuts the list.
+        # Papers left out stay uncovered and are considered again by the next synthesis
+        summaries_by_paper = dict(zip(included_paper_ids, relevant_paper_summaries))
+        included_paper_ids = rank_by_relevance(SUMMARY_VECTORS, topic.name, included_paper_ids)
+        if settings.SYNTHESIS_TOP_K and len(included_paper_ids) > settings.SYNTHESIS_TOP_K:
+            included_paper_ids = included_paper_ids[:settings.SYNTHESIS_TOP_K]
+            logger.info(f"Selected the {len(included_paper_ids)} most relevant papers for topic '{topic.name}'.")
+        relevant_paper_summaries = [summaries_by_paper[p_id] for p_id in included_paper_ids]
+
         if not relevant_paper_summaries:
+            if previous_synthesis:
+                logger.info(f"No new summarized papers for topic '{topic.name}'. Keeping synthesis {previous_synthesis.id}.")
+                return previous_synthesis.id
             logger.warning(f"No individual summaries available for topic '{topic.name}' (ID: {topic_id}). Skipping synthesis.")
             return None
 
-        combined_summaries_text = "\n\n---\n\n".join(relevant_paper_summaries)
+        try:
+            # Cost scales with the new papers: only their summaries (condensed if needed) enter the prompt
+            summary_items = tree_reduce_summaries(topic.name, relevant_paper_summaries, included_paper_ids)
+            builder = PromptBuilder("synthesis", synthesis_llm.model, max_output_tokens=SYNTHESIS_MAX_TOKENS)
+            builder.add_items([text for text, _ in summary_items])
+
+            if previous_synthesis:
+                previous_text = previous_synthesis.content.split(REFERENCES_SEPARATOR)[0]
+                prompt = builder.build(INCREMENTAL_SYNTHESIS_PROMPT, topic=topic.name, previous_synthesis=previous_text)
+            else:
+                prompt = builder.build(SYNTHESIS_PROMPT, topic=topic.name)
 
-        prompt = (
-            f"Synthesize the key findings, trends, and common themes from the following research paper summaries "
-            f"related to the topic '{topic.name}'. Identify any conflicting findings or research gaps. "
-            f"Provide an overview suitable for a short podcast segment (around 300-500 words).\n\n"
-            f"Topic: {topic.name}\n\n"
-            f"Individual Paper Summaries:\n{combined_summaries_text}\n\n"
-            "Cross-Paper Synthesis:"
-        )
+            if not builder.usage["included_items"]:
+                logger.warning(f"No paper summaries fit the synthesis prompt for topic '{topic.name}'.")
+                return previous_synthesis.id if previous_synthesis else None
+            # Only papers behind the packed items count as covered; the rest are considered again next time
+            included_paper_ids = [p_id for _, ids in summary_items[:builder.usage["included_items"]] for p_id in ids]
 
-        try:
-            synthesis_content = synthesis_llm.generate_text(prompt, max_tokens=600, temperature=0.7)
+            # Streamed straight into the synthesis file, so the first words are on disk within a second
+            synthesis_filename = generate_unique_filename(f"topic_{topic.name.replace(' ', '_').lower()}_synthesis", "txt", settings.SUMMARIES_DIR)
+            synthesis_file_path, synthesis_content = stream_text_to_file(
+                synthesis_llm.stream_text(prompt, max_tokens=SYNTHESIS_MAX_TOKENS, temperature=0.7),
+                settings.SUMMARIES_DIR, synthesis_filename
+            )
 
             if synthesis_content:
+                all_paper_ids = sorted(covered_paper_ids | set(included_paper_ids))
+
                 # Add citations to the end of the synthesis
-                citations_text = get_citations_for_summary(db, paper_ids)
+                citations_text = get_citations_for_summary(db, all_paper_ids)
                 if citations_text:
-                    synthesis_content += "\n\n---\n\nReferences:\n" + citations_text
-
-                # Save synthesis to file
-                synthesis_filename = generate_unique_filename(f"topic_{topic.name.replace(' ', '_').lower()}_synthesis", "txt", settings.SUMMARIES_DIR)
-                synthesis_file_path = save_text_to_file(synthesis_content, settings.SUMMARIES_DIR, synthesis_filename)
+                    synthesis_content += REFERENCES_SEPARATOR + citations_text
+                    with open(synthesis_file_path, "a", encoding="utf-8") as f:
+                        f.write(REFERENCES_SEPARATOR + citations_text)
 
-                # Store synthesis in DB, linking to topic
+                # Store synthesis in DB, linking to topic and recording the papers it covers
                 db_synthesis = create_summary(
                     db,
                     summary_type=SummaryType.CROSS_PAPER_SYNTHESIS,
                     content=synthesis_content,
                     topic_id=topic.id,
-                    audio_path=None # Audio path will be updated by audio agent
+                    audio_path=None, # Audio path will be updated by audio agent
+                    covered_paper_ids=all_paper_ids
                 )
-                logger.info(f"Cross-paper synthesis generated for topic '{topic.name}'. Summary ID: {db_synthesis.id}")
+                logger.info(f"Cross-paper synthesis generated for topic '{topic.name}' ({len(included_paper_ids)} new papers). Summary ID: {db_synthesis.id}")
                 return db_synthesis.id
             else:
                 logger.warning(f"Failed to generate synthesis for topic ID {topic_id}.")
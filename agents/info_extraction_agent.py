@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from celery import shared_task
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings
+from database.crud import get_paper_by_id, get_extracted_data_by_paper_id, update_extracted_data
+from database.models import SessionLocal
+from utils.embeddings import STOPWORDS, TOKEN_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Canonical section names and the headings that introduce them (matched against the whole heading line)
+SECTION_HEADINGS = [
+    ("abstract", r"abstract|summary"),
+    ("introduction", r"introduction|intro"),
+    ("background", r"background|preliminaries"),
+    ("related_work", r"related work|related literature|literature review|prior work"),
+    ("methods", r"methods?|methodology|approach|proposed (?:method|approach)|materials and methods|model"),
+    ("experiments", r"experiments?|experimental (?:setup|settings?|results)|evaluation"),
+    ("results", r"results(?: and (?:analysis|discussion))?|findings"),
+    ("discussion", r"discussion"),
+    ("limitations", r"limitations"),
+    ("conclusion", r"conclusions?(?: and future work)?|concluding remarks|summary and conclusions?"),
+    ("acknowledgments", r"acknowledge?ments?"),
+    ("references", r"references|bibliography|works cited"),
+    ("appendix", r"appendix(?: [a-z])?|appendices|supplementary materials?"),
+]
+SECTION_PATTERNS = [(name, re.compile(rf"(?:{pattern})", re.IGNORECASE)) for name, pattern in SECTION_HEADINGS]
+
+HEADING_NUMBER = re.compile(r"^(?:(\d+(?:\.\d+)*)\.?|([IVX]+)\.|([A-H])\.)\s+") # "2", "2.1", "IV.", "A."
+INLINE_ABSTRACT = re.compile(r"^abstract\s*[:.\-—–]\s*(\S.*)$", re.IGNORECASE) # "Abstract— We propose..."
+KEYWORDS_LINE = re.compile(r"^\s*(?:key\s*words|keywords|index terms)\s*[:.\-—–]\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+FIGURE_CAPTION = re.compile(r"^\s*(?:figure|fig\.)\s*(\d+)\s*[:.|]\s*(\S.*)$", re.IGNORECASE | re.MULTILINE)
+TABLE_CAPTION = re.compile(r"^\s*table\s*(\d+|[IVX]+)\s*[:.|]\s*(\S.*)$", re.IGNORECASE | re.MULTILINE)
+
+MAX_HEADING_CHARS = 80
+MAX_HEADING_WORDS = 10
+KEY_SECTIONS = ("abstract", "introduction", "conclusion")
+SECTION_FALLBACKS = {"conclusion": ("discussion",), "introduction": ("background",)}
+UNNUMBERED_SECTIONS = {"abstract", "acknowledgments", "references", "appendix"} # Unnumbered even in numbered papers
+
+KEYWORD_STOPWORDS = {
+    "propose", "proposed", "method", "model", "use", "used", "new", "work", "present", "however", "et", "al",
+    "fig", "figure", "table", "section", "one", "two", "three", "first", "second", "such", "more", "most",
+    "than", "not", "but", "been", "all", "both", "each", "other", "into", "over", "between", "while",
+    "where", "when", "how", "what", "only", "well", "thus", "may", "will", "would", "could", "should",
+    "can", "do", "does", "if", "then", "there", "they", "them", "his", "her", "here", "via", "without",
+    "within", "across", "due", "per", "further", "given", "show", "shown", "obtain", "obtained", "abstract",
+    "papers", "results", "approaches", "methods", "models", "many", "much", "very", "any", "some", "same",
+    "before", "after", "keywords", "cut", "make", "makes",
+} | STOPWORDS
+
+def _normalize_heading(line: str) -> str:
+    """Lowercases a heading and strips its numbering and trailing punctuation."""
+    return " ".join(HEADING_NUMBER.sub("", line.strip()).lower().rstrip(":.").split())
+
+def _pdf_heading_lines(pdf_path: str) -> Set[str]:
+    """
+    Returns the normalized text of lines set in a larger or bold font than the body text,
+    which are the heading candidates of a PDF. Only the first INFO_EXTRACTION_MAX_PDF_PAGES pages are read.
+    """
+    import fitz # PyMuPDF
+    lines = []
+    chars_by_size = Counter()
+    with fitz.open(pdf_path) as doc:
+        for page in doc.pages(0, min(doc.page_count, settings.INFO_EXTRACTION_MAX_PDF_PAGES)):
+            for block in page.get_text("dict")["blocks"]:
+                for line in block.get("lines", []):
+                    spans = [span for span in line["spans"] if span["text"].strip()]
+                    if not spans:
+                        continue
+                    text = " ".join(span["text"].strip() for span in spans)
+                    size = round(max(span["size"] for span in spans), 1)
+                    bold = all(span["flags"] & 16 for span in spans) # Bit 4 of the span flags is bold
+                    chars_by_size[size] += len(text)
+                    lines.append((text, size, bold))
+    if not chars_by_size:
+        return set()
+    body_size = chars_by_size.most_common(1)[0][0] # The size most characters are set in
+    return {
+        _normalize_heading(text) for text, size, bold in lines
+        if len(text) <= MAX_HEADING_CHARS and (size >= body_size * 1.15 or (bold and size >= body_size))
+    }
+
+def _match_heading(line: str, pdf_headings: Optional[Set[str]], in_body: bool,
+                   numbered: bool = False) -> Tuple[Optional[str], Optional[str], int]:
+    """
+    Decides whether a stripped line is a section heading. With PDF fonts, an unnumbered heading
+    must be set in a heading font. Once the paper has used numbered headings (numbered=True),
+    unnumbered lines such as a "Method" table header are not headings, except for sections
+    that are never numbered. Returns (section name, heading text, offset in the line where the section body starts),
+    or (None, None, 0) for ordinary text.
+    """
+    if not line or len(line) > MAX_HEADING_CHARS * 4:
+        return None, None, 0
+    inline_abstract = INLINE_ABSTRACT.match(line)
+    if inline_abstract and not in_body:
+        return "abstract", "Abstract", inline_abstract.start(1)
+    if len(line) > MAX_HEADING_CHARS:
+        return None, None, 0
+
+    number = HEADING_NUMBER.match(line)
+    if number and number.group(1) and "." in number.group(1).strip("."):
+        return None, None, 0 # Subsections such as "3.1 Setup" stay inside their section
+    heading = _normalize_heading(line)
+    if number is None and pdf_headings is not None and heading not in pdf_headings:
+        return None, None, 0 # Set in the body font
+    for name, pattern in SECTION_PATTERNS:
+        if pattern.fullmatch(heading):
+            if numbered and number is None and name not in UNNUMBERED_SECTIONS:
+                return None, None, 0
+            return name, line.rstrip(":"), len(line)
+
+    # Other top-level headings split sections once the body has started (front matter is skipped)
+    words = heading.split()
+    if not in_body or not words or len(words) > MAX_HEADING_WORDS or line.endswith("."):
+        return None, None, 0
+    if pdf_headings is not None:
+        is_heading = heading in pdf_headings and (number is not None or not numbered)
+    else:
+        is_heading = number is not None and number.group(1) is not None and line[number.end():][:1].isupper()
+    if is_heading:
+        return re.sub(r"[^a-z0-9]+", "_", heading).strip("_"), line, len(line)
+    return None, None, 0
+
+def segment_sections(full_text: str, pdf_headings: Optional[Set[str]] = None) -> Dict[str, dict]:
+    """
+    Splits a paper's text into sections by its headings.
+    Returns {section name: {"heading": str, "start": int, "end": int}} in document order, where
+    start/end are character offsets into full_text, so section text is not stored twice.
+    """
+    sections = {}
+    current = None # [name, heading, start]
+    numbered = False
+
+    def close(end: int):
+        name, heading, start = current
+        if full_text[start:end].strip():
+            key, suffix = name, 2
+            while key in sections: # A repeated heading, e.g. a second "Discussion"
+                key, suffix = f"{name}_{suffix}", suffix + 1
+            sections[key] = {"heading": heading, "start": start, "end": end}
+
+    offset = 0
+    for line in full_text.splitlines(keepends=True):
+        stripped = line.strip()
+        name, heading, body_offset = _match_heading(stripped, pdf_headings, in_body=current is not None, numbered=numbered)
+        if name:
+            numbered = numbered or HEADING_NUMBER.match(stripped) is not None
+            if current:
+                close(offset)
+            current = [name, heading, offset + line.index(stripped) + body_offset]
+        offset += len(line)
+    if current:
+        close(len(full_text))
+    return sections
+
+def get_section_text(full_text: str, sections, names: Iterable[str] = KEY_SECTIONS, max_chars: Optional[int] = None) -> str:
+    """
+    Returns the named sections (falling back to e.g. Discussion when there is no Conclusion),
+    each under its heading. max_chars is shared evenly so every section keeps its opening.
+    Returns "" when none of the sections were found.
+    """
+    if isinstance(sections, str):
+        sections = json.loads(sections)
+    sections = sections or {}
+    parts = []
+    for name in names:
+        section = sections.get(name) or next((sections[f] for f in SECTION_FALLBACKS.get(name, ()) if f in sections), None)
+        if section:
+            text = full_text[section["start"]:section["end"]].strip()
+            if text:
+                parts.append((section["heading"], text))
+    if not parts:
+        return ""
+    budget = max_chars // len(parts) if max_chars else None
+    return "\n\n".join(f"{heading}:\n{text[:budget] if budget else text}" for heading, text in parts)
+
+def extract_keywords(full_text: str, sections: Dict[str, dict], title: str = "", top_n: int = None) -> List[str]:
+    """
+    Returns the author keywords if the paper lists them, otherwise the most frequent terms and
+    two-word phrases of the title, abstract, introduction and conclusion (title terms count triple).
+    """
+    top_n = top_n or settings.KEYWORDS_PER_PAPER
+    keywords_line = KEYWORDS_LINE.search(full_text[:20000])
+    if keywords_line:
+        keywords = [k.strip(" .") for k in re.split(r"[;,·•]", keywords_line.group(1)) if k.strip(" .")]
+        if keywords:
+            return keywords[:top_n]
+
+    key_text = get_section_text(full_text, sections) or full_text[:8000]
+    scores = Counter()
+    for text, weight in ((title or "", 3), (key_text, 1)):
+        tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if len(t) > 2 and not t.isdigit() and t not in KEYWORD_STOPWORDS]
+        for token in tokens:
+            scores[token] += weight
+        for first, second in zip(tokens, tokens[1:]):
+            if first != second:
+                scores[f"{first} {second}"] += weight * 1.5 # Phrases are more specific than single words
+
+    keywords = []
+    for term, score in scores.most_common():
+        if " " in term and score < 3:
+            continue # A phrase seen once is usually not a key term
+        if any(term in selected.split(" ") or (" " in term and set(term.split()) <= set(selected.split())) for selected in keywords):
+            continue # Already covered by a selected phrase
+        keywords.append(term)
+        if len(keywords) == top_n:
+            break
+    return keywords
+
+def extract_captions(full_text: str, pattern: re.Pattern) -> List[dict]:
+    """Returns [{"number": str, "caption": str}, ...] for the first caption of each figure or table number."""
+    captions = {}
+    for match in pattern.finditer(full_text):
+        number = match.group(1)
+        if number not in captions:
+            captions[number] = {"number": number, "caption": match.group(2).strip()[:300]}
+    return list(captions.values())
+
+def extract_paper_info(full_text: str, title: Optional[str] = None, pdf_path: Optional[str] = None) -> dict:
+    """
+    Extracts sections, keywords, figure and table captions from a paper's text, using the PDF's
+    font sizes to recognize headings when the PDF is available. Runs locally without any LLM call.
+    Returns keyword arguments for create_extracted_data/update_extracted_data, or {} on failure.
+    """
+    try:
+        pdf_headings = None
+        if pdf_path and os.path.exists(pdf_path):
+            try:
+                pdf_headings = _pdf_heading_lines(pdf_path)
+            except Exception as e:
+                logger.warning(f"Could not read fonts from {pdf_path}, using text headings only: {e}")
+        sections = segment_sections(full_text, pdf_headings)
+        if pdf_headings is not None and not sections:
+            sections = segment_sections(full_text) # Unusual fonts: fall back to text-only headings
+        return {
+            "sections_json": sections,
+            "keywords_json": extract_keywords(full_text, sections, title or ""),
+            "figures_info_json": extract_captions(full_text, FIGURE_CAPTION),
+            "tables_info_json": extract_captions(full_text, TABLE_CAPTION),
+        }
+    except Exception as e:
+        logger.error(f"Error extracting sections and keywords: {e}")
+        return {}
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def extract_paper_info_task(self, paper_id: int) -> Optional[int]:
+    """
+    (Re-)extracts sections, keywords and captions for an already processed paper, e.g. papers
+    ingested before section extraction existed. Returns paper_id on success, None on failure.
+    """
+    with SessionLocal() as db:
+        paper = get_paper_by_id(db, paper_id)
+        extracted_data = get_extracted_data_by_paper_id(db, paper_id) if paper else None
+        if not extracted_data or not extracted_data.full_text_path:
+            logger.warning(f"No extracted text found for paper ID {paper_id}. Cannot extract sections.")
+            return None
+
+        try:
+            with open(extracted_data.full_text_path, 'r', encoding='utf-8') as f:
+                full_text = f.read()
+            extracted_info = extract_paper_info(full_text, paper.title, paper.local_path)
+            update_extracted_data(db, paper.id, **extracted_info)
+            logger.info(f"Extracted {len(extracted_info.get('sections_json') or {})} sections for paper {paper.id}.")
+            return paper.id
+        except Exception as e:
+            logger.error(f"Error in InfoExtractionAgent for paper ID {paper_id}: {e}")
+            self.retry(exc=e)
+            return None
\ No newline at end of file
@@ -1,6 +1,7 @@
 import logging
 import os
 import requests
+from typing import Optional, Tuple
 from celery import shared_task
 
 import sys
@@ -10,20 +11,137 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import settings
 from database.crud import (
     get_paper_by_id, update_paper_status, update_paper_details,
-    create_extracted_data, create_citation
+    create_extracted_data, create_citation, get_extracted_data_by_paper_id,
+    get_extracted_data_by_text_path, update_extracted_data, copy_extracted_data, index_paper_fulltext
 )
 from database.models import SessionLocal, PaperStatus, ExtractedData
-from utils.pdf_parser import extract_text_from_pdf, extract_metadata_from_pdf
+from agents.base_agent import unit_of_work
+from agents.info_extraction_agent import extract_paper_info
+from utils.pdf_parser import parse_pdf
 from utils.web_scraper import get_html_content, extract_text_from_html, resolve_doi_to_url
-from utils.file_utils import save_text_to_file, generate_unique_filename
+from utils.content_store import compute_file_hash, compute_content_hash, get_cached_text, store_text
 from utils.citation_manager import extract_and_store_citation # Import the helper
+from utils.vector_index import index_texts, PAPER_VECTORS
 
 logger = logging.getLogger(__name__)
 
+def _extract_html_text(html_content: str) -> Optional[str]:
+    """Extracts text from HTML into the content store, skipping parsing for pages seen before."""
+    if not html_content:
+        return None
+    content_hash = compute_content_hash(html_content)
+    text_file_path, _ = get_cached_text(content_hash)
+    if not text_file_path:
+        text_file_path = store_text(content_hash, [extract_text_from_html(html_content)])
+    return text_file_path
+
+def _extract_paper_text(paper) -> Tuple[Optional[str], dict, Optional[str]]:
+    """
+    Extracts a paper's text into the content store without touching the database.
+    Returns (text_file_path, extracted_metadata, resolved_url).
+    """
+    text_file_path = None
+    extracted_metadata = {}
+    resolved_url = None
+
+    if paper.local_path and os.path.exists(paper.local_path):
+        # Process local PDF, reusing the stored text if these exact bytes were parsed before.
+        # Otherwise it is opened once for metadata, large documents are parsed across the process pool,
+        # and pages are streamed straight to the text file to keep memory flat
+        content_hash = compute_file_hash(paper.local_path)
+        text_file_path, extracted_metadata = get_cached_text(content_hash)
+        if not text_file_path:
+            extracted_metadata, text_chunks = parse_pdf(paper.local_path)
+            text_file_path = store_text(content_hash, text_chunks, extracted_metadata)
+        logger.info(f"Processed local PDF: {paper.local_path}")
+    elif paper.doi:
+        # Resolve DOI and download/scrape
+        resolved_url = resolve_doi_to_url(paper.doi)
+        if resolved_url:
+            html_content = get_html_content(resolved_url)
+            text_file_path = _extract_html_text(html_content)
+            # For DOI, also try to download PDF if possible (more advanced)
+            # This would involve finding PDF links on the page, or using APIs
+            # For simplicity, we'll just extract text from HTML for now.
+            logger.info(f"Processed DOI: {paper.doi} via URL: {resolved_url}")
+        else:
+            logger.warning(f"Could not resolve DOI {paper.doi} to a URL.")
+    elif paper.url:
+        # Scrape URL
+        html_content = get_html_content(paper.url)
+        text_file_path = _extract_html_text(html_content)
+        logger.info(f"Processed URL: {paper.url}")
+    else:
+        logger.warning(f"Paper ID {paper.id} has no local_path, DOI, or URL to process.")
+
+    return text_file_path, extracted_metadata, resolved_url
+
+def _save_processed_paper(paper_id: int, text_file_path: Optional[str], extracted_metadata: dict,
+                          resolved_url: Optional[str], pdf_path: Optional[str] = None) -> Optional[int]:
+    """
+    Writes the outcome of processing a paper (details, extracted data with sections and keywords,
+    citation, status, full-text index entry) in one unit of work.
+    Returns the paper_id if text was extracted, None otherwise.
+    """
+    full_text = None
+    extracted_info = {}
+    if text_file_path:
+        # Read and segment before the unit of work so no file I/O happens while holding the write lock
+        with open(text_file_path, 'r', encoding='utf-8') as f:
+            full_text = f.read()
+        if settings.INFO_EXTRACTION_ENABLED:
+            extracted_info = extract_paper_info(full_text, extracted_metadata.get('title'), pdf_path)
+
+    with unit_of_work() as db:
+        if not text_file_path:
+            logger.warning(f"No text extracted for paper ID {paper_id}.")
+            update_paper_status(db, paper_id, PaperStatus.FAILED, commit=False)
+            return None
+
+        paper = get_paper_by_id(db, paper_id)
+        # Update paper details if new info was extracted (e.g., from PDF metadata)
+        paper = update_paper_details(db, paper_id,
+                                     title=extracted_metadata.get('title') or paper.title,
+                                     authors=extracted_metadata.get('author') or paper.authors,
+                                     url=resolved_url, # Update URL in DB
+                                     status=PaperStatus.PROCESSED,
+                                     commit=False)
+
+        # Store extracted data, reusing what was already extracted for identical content
+        if get_extracted_data_by_paper_id(db, paper.id):
+            update_extracted_data(db, paper.id, full_text_path=text_file_path, **extracted_info, commit=False)
+        else:
+            shared_extracted_data = get_extracted_data_by_text_path(db, text_file_path)
+            if shared_extracted_data:
+                copy_extracted_data(db, shared_extracted_data, paper.id, commit=False)
+            else:
+                create_extracted_data(db, paper.id, full_text_path=text_file_path, **extracted_info, commit=False)
+
+        # Create citation entry
+        extract_and_store_citation(db, paper.id, {
+            'title': paper.title,
+            'authors': paper.authors,
+            'publication_year': paper.publication_year,
+            'doi': paper.doi,
+            'url': paper.url
+        }, commit=False)
+
+        index_paper_fulltext(db, paper.id, title=paper.title or "", abstract=paper.abstract or "", full_text=full_text, commit=False)
+        # Papers without an abstract are embedded from the start of their text
+        embedding_text = f"{paper.title or ''}\n{paper.abstract or (full_text or '')[:2000]}"
+
+    # Embedded once here, after the write lock is released, for related-paper lookups
+    index_texts(PAPER_VECTORS, {paper_id: embedding_text})
+    logger.info(f"Paper {paper_id} processed successfully. Text saved to {text_file_path}")
+    return paper_id
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def process_paper_task(self, paper_id: int) -> Optional[int]:
     """
     Processes a single paper: downloads if necessary, extracts text, and updates DB.
+    The paper is marked PROCESSING up front. Downloads and parsing then happen outside any transaction,
+    and all resulting writes (paper details, extracted data, citation, status) are committed together
+    in one unit of work.
     Returns the paper_id on success, None on failure.
     """
     with SessionLocal() as db:
@@ -33,73 +151,15 @@ def process_paper_task(self, paper_id: int) -> Optional[int]:
             return None
 
         update_paper_status(db, paper.id, PaperStatus.PROCESSING)
-        full_text = None
-        extracted_metadata = {}
-        downloaded_path = None
-
-        try:
-            if paper.local_path and os.path.exists(paper.local_path):
-                # Process local PDF
-                full_text = extract_text_from_pdf(paper.local_path)
-                extracted_metadata = extract_metadata_from_pdf(paper.local_path)
-                logger.info(f"Processed local PDF: {paper.local_path}")
-            elif paper.doi:
-                # Resolve DOI and download/scrape
-                resolved_url = resolve_doi_to_url(paper.doi)
-                if resolved_url:
-                    paper.url = resolved_url # Update URL in DB
-                    html_content = get_html_content(resolved_url)
-                    full_text = extract_text_from_html(html_content)
-                    # For DOI, also try to download PDF if possible (more advanced)
-                    # This would involve finding PDF links on the page, or using APIs
-                    # For simplicity, we'll just extract text from HTML for now.
-                    logger.info(f"Processed DOI: {paper.doi} via URL: {resolved_url}")
-                else:
-                    logger.warning(f"Could not resolve DOI {paper.doi} to a URL.")
-            elif paper.url:
-                # Scrape URL
-                html_content = get_html_content(paper.url)
-                full_text = extract_text_from_html(html_content)
-                logger.info(f"Processed URL: {paper.url}")
-            else:
-                logger.warning(f"Paper ID {paper_id} has no local_path, DOI, or URL to process.")
-                update_paper_status(db, paper.id, PaperStatus.FAILED)
-                return None
 
-            if full_text:
-                # Save extracted text to file
-                text_filename = generate_unique_filename(f"paper_{paper.id}", "txt", settings.PROCESSED_TEXTS_DIR)
-                text_file_path = save_text_to_file(full_text, settings.PROCESSED_TEXTS_DIR, text_filename)
+    try:
+        text_file_path, extracted_metadata, resolved_url = _extract_paper_text(paper)
+        return _save_processed_paper(paper_id, text_file_path, extracted_metadata, resolved_url, paper.local_path)
 
-                # Update paper details if new info was extracted (e.g., from PDF metadata)
-                update_paper_details(db, paper.id,
-                                     title=extracted_metadata.get('title') or paper.title,
-                                     authors=extracted_metadata.get('author') or paper.authors,
-                                     status=PaperStatus.PROCESSED)
-
-                # Store extracted data
-                create_extracted_data(db, paper.id, full_text_path=text_file_path)
-
-                # Create citation entry
-                extract_and_store_citation(db, paper.id, {
-                    'title': paper.title,
-                    'authors': paper.authors,
-                    'publication_year': paper.publication_year,
-                    'doi': paper.doi,
-                    'url': paper.url
-                })
-
-
-                update_paper_status(db, paper.id, PaperStatus.PROCESSED)
-                logger.info(f"Paper {paper.id} processed successfully. Text saved to {text_file_path}")
-                return paper.id
-            else:
-                logger.warning(f"No text extracted for paper ID {paper.id}.")
-                update_paper_status(db, paper.id, PaperStatus.FAILED)
-                return None
-
-        except Exception as e:
-            logger.error(f"Error in IngestionProcessingAgent for paper ID {paper.id}: {e}")
-            update_paper_status(db, paper.id, PaperStatus.FAILED)
-            self.retry(exc=e) # Retry the task on failure
-            return None
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"Error in IngestionProcessingAgent for paper ID {paper_id}: {e}")
+        # The unit of work has been rolled back; record the failure on its own
+        with SessionLocal() as db:
+            update_paper_status(db, paper_id, PaperStatus.FAILED)
+        self.retry(exc=e) # Retry the task on failure
+        return None
\ No newline at end of file
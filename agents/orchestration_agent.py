@@ -0,0 +1,124 @@
+import logging
+from typing import List, Optional, Tuple
+from celery import shared_task, chain, chord, group
+from celery.result import GroupResult
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings
+from database.crud import get_summary_by_id, get_topic_by_name, get_papers_by_topic, get_papers_by_ids
+from database.models import SessionLocal, PaperStatus
+from agents.ingestion_processing_agent import process_paper_task
+from agents.topic_classification_agent import classify_paper_task, classify_papers_batch_task
+from agents.summary_generation_agent import generate_individual_summary_task
+from agents.cross_paper_synthesis_agent import generate_cross_paper_synthesis_task
+from agents.audio_generation_agent import generate_audio_task
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True)
+def generate_summary_audio_task(self, summary_id: Optional[int]):
+    """
+    Chain link between a summary task and the audio agent: loads the summary content for
+    the summary_id returned by the previous task and replaces itself with the audio task.
+    """
+    if not summary_id:
+        logger.warning("No summary produced upstream. Skipping audio generation.")
+        return None
+
+    with SessionLocal() as db:
+        summary = get_summary_by_id(db, summary_id)
+        if not summary:
+            logger.error(f"Summary with ID {summary_id} not found for audio generation.")
+            return None
+        content = summary.content
+
+    raise self.replace(generate_audio_task.si(summary_id, content))
+
+@shared_task(bind=True)
+def synthesize_topics_task(self, paper_results: List, topic_names: List[str]):
+    """
+    Chord callback fired once every per-paper chain has finished. Fans out one
+    synthesis -> audio chain per requested topic, over all summarized papers in that topic.
+    """
+    synthesis_chains = []
+    with SessionLocal() as db:
+        for topic_name in topic_names:
+            topic = get_topic_by_name(db, topic_name)
+            if not topic:
+                logger.warning(f"Topic '{topic_name}' not found in database. Skipping synthesis.")
+                continue
+            # Get all papers associated with this topic that have an individual summary
+            relevant_paper_ids = [p.id for p in get_papers_by_topic(db, topic.id) if p.status == PaperStatus.SUMMARIZED]
+            if not relevant_paper_ids:
+                logger.warning(f"No summarized papers found for topic '{topic_name}'. Skipping synthesis.")
+                continue
+            logger.info(f"Queuing synthesis for topic '{topic_name}' with {len(relevant_paper_ids)} papers.")
+            synthesis_chains.append(chain(
+                generate_cross_paper_synthesis_task.si(topic.id, relevant_paper_ids),
+                generate_summary_audio_task.s()
+            ))
+
+    if not synthesis_chains:
+        return []
+    raise self.replace(group(synthesis_chains))
+
+def build_paper_chain(paper_id: int, topic_list: List[str], process: bool = True):
+    """
+    Builds the per-paper chain process -> classify -> summarize -> audio. Each task returns
+    the ID the next one needs, so a paper moves to its next stage as soon as it is ready.
+    """
+    steps = []
+    if process:
+        steps.append(process_paper_task.si(paper_id))
+    if topic_list:
+        # classify_paper_task takes the paper_id returned by process_paper_task when chained after it
+        steps.append(classify_paper_task.s(topic_list) if steps else classify_paper_task.si(paper_id, topic_list))
+    steps.append(generate_individual_summary_task.s() if steps else generate_individual_summary_task.si(paper_id))
+    steps.append(generate_summary_audio_task.s())
+    return chain(*steps)
+
+def build_workflow(paper_ids: List[int], topic_list: List[str], synthesis_topics: List[str], process: bool = True):
+    """
+    Builds the full workflow for a batch: one independent chain per paper, with cross-paper
+    synthesis for `synthesis_topics` fired as a chord callback once all chains complete.
+    When batched classification is enabled, papers that already have an abstract (or text, when
+    they are not processed here) are classified in chunks of CLASSIFICATION_BATCH_SIZE (one LLM
+    request per chunk) that run alongside the paper chains rather than after them; the other
+    papers are classified in their own chain once their text is extracted.
+    Every paper is processed inside its own chain, so its summary starts as soon as its own
+    download and parsing are done; concurrent downloads come from the chains running in parallel.
+    The group lists the paper chains first, in paper_ids order, then the classification chunks.
+    """
+    batch_paper_ids = []
+    if topic_list and settings.CLASSIFICATION_BATCH_SIZE > 1 and len(paper_ids) > 1:
+        with SessionLocal() as db:
+            batchable_ids = {p.id for p in get_papers_by_ids(db, paper_ids) if p.abstract or not process}
+        batch_paper_ids = [paper_id for paper_id in paper_ids if paper_id in batchable_ids]
+    batched = set(batch_paper_ids)
+    paper_chains = [build_paper_chain(paper_id, [] if paper_id in batched else topic_list, process=process) for paper_id in paper_ids]
+    batch_size = settings.CLASSIFICATION_BATCH_SIZE
+    classification_tasks = [
+        classify_papers_batch_task.si(batch_paper_ids[start:start + batch_size], topic_list)
+        for start in range(0, len(batch_paper_ids), batch_size)
+    ]
+
+    workflow = group(paper_chains + classification_tasks)
+    if synthesis_topics:
+        # Synthesis needs every summary and topic assignment, so it waits for the whole group
+        workflow = chord(workflow, synthesize_topics_task.s(synthesis_topics))
+    return workflow
+
+def split_workflow_results(workflow_result, paper_count: int) -> Tuple[List, List]:
+    """
+    Returns (per-paper chain results, batch classification results) of an applied workflow
+    built for paper_count papers, whatever callback follows them.
+    """
+    result = workflow_result
+    while result is not None and not isinstance(result, GroupResult):
+        result = result.parent
+    if result is None:
+        return [], []
+    return result.results[:paper_count], result.results[paper_count:]
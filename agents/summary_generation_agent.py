@@ -1,5 +1,7 @@
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from celery import shared_task
 
 import sys
@@ -7,13 +9,65 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import settings
-from database.crud import get_paper_by_id, get_extracted_data_by_paper_id, create_summary, update_paper_status
+from database.crud import get_paper_by_id, get_extracted_data_by_paper_id, create_summary, update_paper_status, index_paper_fulltext
 from database.models import SessionLocal, PaperStatus, SummaryType
+from agents.base_agent import unit_of_work
 from utils.llm_utils import summary_llm
-from utils.file_utils import save_text_to_file, generate_unique_filename
+from utils.file_utils import stream_text_to_file, generate_unique_filename
+from utils.tokens import count_tokens, split_into_token_chunks
+from utils.vector_index import index_texts, SUMMARY_VECTORS
+from utils.prompt_builder import PromptBuilder
+from agents.info_extraction_agent import get_section_text
 
 logger = logging.getLogger(__name__)
 
+SUMMARY_MAX_TOKENS = 250
+TRUNCATE_MODE_INPUT_TOKENS = 1000 # About the 4000 characters the truncate mode used to send
+SUMMARY_PROMPT = (
+    "Summarize the following research paper abstract/full text. "
+    "Focus on the main objective, key methods, major findings, and conclusions. "
+    "Keep the summary concise, around 150-200 words.\n\n"
+    "Paper Title: {title}\n"
+    "Paper Content:\n{content}\n\n"
+    "Summary:"
+)
+
+def _summarize_chunk(title: str, chunk: str) -> Optional[str]:
+    """
+    Map step: summarizes one chunk of a paper. The prompt depends only on the title and the chunk
+    (no part numbers), so a chunk that is unchanged keeps its cache entry even if chunks before it change.
+    """
+    prompt = (
+        f"The following is one part of a research paper. "
+        f"Summarize this part in a few sentences, keeping any objectives, methods, findings and conclusions it contains. "
+        f"Do not add information that is not in the text.\n\n"
+        f"Paper Title: {title}\n"
+        f"Paper Content:\n{chunk}\n\n"
+        "Part Summary:"
+    )
+    # Temperature 0 keeps chunk summaries deterministic, so the LLM response cache serves unchanged chunks on re-runs
+    return summary_llm.generate_text(prompt, max_tokens=settings.SUMMARY_CHUNK_SUMMARY_TOKENS, temperature=0.0)
+
+def _summarize_chunks(title: str, chunks: List[str]) -> List[str]:
+    """Summarizes chunks concurrently, keeping their order and dropping failed chunks."""
+    with ThreadPoolExecutor(max_workers=max(1, settings.SUMMARY_MAP_CONCURRENCY)) as executor:
+        summaries = list(executor.map(lambda chunk: _summarize_chunk(title, chunk), chunks))
+    return [s for s in summaries if s]
+
+def map_reduce_summaries(title: str, full_text: str) -> List[str]:
+    """
+    Splits the text into SUMMARY_CHUNK_TOKENS chunks and summarizes them in parallel. If the
+    chunk summaries together still exceed one chunk, they are grouped and summarized again
+    until they fit a single prompt. Returns the ordered partial summaries for the reduce step.
+    """
+    partial_summaries = _summarize_chunks(title, split_into_token_chunks(full_text, settings.SUMMARY_CHUNK_TOKENS))
+    while len(partial_summaries) > 1 and count_tokens("\n\n".join(partial_summaries)) > settings.SUMMARY_CHUNK_TOKENS:
+        groups = split_into_token_chunks("\n\n".join(partial_summaries), settings.SUMMARY_CHUNK_TOKENS)
+        if len(groups) >= len(partial_summaries):
+            break # Summaries are too long to combine further
+        partial_summaries = _summarize_chunks(title, groups)
+    return partial_summaries
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def generate_individual_summary_task(self, paper_id: int) -> Optional[int]:
     """
@@ -36,36 +90,58 @@ def generate_individual_summary_task(self, paper_id: int) -> Optional[int]:
             with open(extracted_data.full_text_path, 'r', encoding='utf-8') as f:
                 full_text = f.read()
 
-            # Prioritize abstract, then full text (first N characters)
-            text_to_summarize = paper.abstract or full_text[:4000] # Limit to fit in LLM context
+            sections = extracted_data.sections_json
+            builder = PromptBuilder("summary", summary_llm.model, max_output_tokens=SUMMARY_MAX_TOKENS,
+                                    max_input_tokens=settings.SUMMARY_MAX_INPUT_TOKENS)
+            if settings.SUMMARY_MODE == "sections" and get_section_text(full_text, sections):
+                # Abstract, introduction and conclusion only: one short prompt. The introduction is cut first if space runs out
+                for name, priority in (("abstract", 0), ("introduction", 2), ("conclusion", 1)):
+                    builder.add(get_section_text(full_text, sections, (name,)), priority=priority)
+            elif settings.SUMMARY_MODE in ("map_reduce", "sections") and count_tokens(full_text) > settings.SUMMARY_CHUNK_TOKENS:
+                # Long paper: summarize every chunk, then reduce the chunk summaries below
+                partial_summaries = map_reduce_summaries(paper.title, full_text)
+                if not partial_summaries:
+                    raise RuntimeError(f"No chunk summaries generated for paper ID {paper.id}")
+                builder.add(paper.abstract, label="Abstract", priority=0)
+                builder.add_items(partial_summaries, label="Section Summaries", priority=1, separator="\n\n")
+            elif settings.SUMMARY_MODE in ("map_reduce", "sections"):
+                builder.add(full_text) # Whole paper fits in one prompt
+            else:
+                # Prioritize the key sections, then the abstract, then the start of the full text
+                builder = PromptBuilder("summary", summary_llm.model, max_output_tokens=SUMMARY_MAX_TOKENS,
+                                        max_input_tokens=TRUNCATE_MODE_INPUT_TOKENS)
+                builder.add(get_section_text(full_text, sections) or paper.abstract or full_text)
+
+            prompt = builder.build(SUMMARY_PROMPT, title=paper.title)
 
-            prompt = (
-                f"Summarize the following research paper abstract/full text. "
-                f"Focus on the main objective, key methods, major findings, and conclusions. "
-                f"Keep the summary concise, around 150-200 words.\n\n"
-                f"Paper Title: {paper.title}\n"
-                f"Paper Content:\n{text_to_summarize}\n\n"
-                "Summary:"
+            # The summary file fills in as the LLM streams, so partial output is on disk (and shown by the CLI) within a second
+            summary_filename = generate_unique_filename(f"paper_{paper.id}_summary", "txt", settings.SUMMARIES_DIR)
+            summary_file_path, summary_content = stream_text_to_file(
+                summary_llm.stream_text(prompt, max_tokens=SUMMARY_MAX_TOKENS, temperature=0.7),
+                settings.SUMMARIES_DIR, summary_filename
             )
 
-            summary_content = summary_llm.generate_text(prompt, max_tokens=250, temperature=0.7)
-
             if summary_content:
-                # Save summary to file
-                summary_filename = generate_unique_filename(f"paper_{paper.id}_summary", "txt", settings.SUMMARIES_DIR)
-                summary_file_path = save_text_to_file(summary_content, settings.SUMMARIES_DIR, summary_filename)
-
-                # Store summary in DB
-                db_summary = create_summary(
-                    db,
-                    summary_type=SummaryType.INDIVIDUAL_PAPER,
-                    content=summary_content,
-                    paper_id=paper.id,
-                    audio_path=None # Audio path will be updated by audio agent
-                )
-                update_paper_status(db, paper.id, PaperStatus.SUMMARIZED)
-                logger.info(f"Individual summary generated for paper {paper.id}. Summary ID: {db_summary.id}")
-                return db_summary.id
+
+                # Summary, status and full-text index entry are committed together
+                with unit_of_work() as uow:
+                    db_summary = create_summary(
+                        uow,
+                        summary_type=SummaryType.INDIVIDUAL_PAPER,
+                        content=summary_content,
+                        paper_id=paper.id,
+                        audio_path=None, # Audio path will be updated by audio agent
+                        commit=False
+                    )
+                    summary_id = db_summary.id
+                    update_paper_status(uow, paper.id, PaperStatus.SUMMARIZED, commit=False)
+                    # Make the new summary searchable from the local library search
+                    index_paper_fulltext(uow, paper.id, summaries="\n\n".join(
+                        s.content for s in get_paper_by_id(uow, paper.id).summaries if s.summary_type == SummaryType.INDIVIDUAL_PAPER
+                    ), commit=False)
+                index_texts(SUMMARY_VECTORS, {paper.id: summary_content})
+                logger.info(f"Individual summary generated for paper {paper.id}. Summary ID: {summary_id}")
+                return summary_id
             else:
                 logger.warning(f"Failed to generate summary for paper ID {paper.id}.")
                 update_paper_status(db, paper.id, PaperStatus.FAILED)
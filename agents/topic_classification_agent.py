@@ -1,5 +1,7 @@
+import json
 import logging
-from typing import List, Optional
+import re
+from typing import Dict, List, Optional
 from celery import shared_task
 
 import sys
@@ -8,15 +10,62 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import settings
 from database.crud import (
-    get_paper_by_id, get_extracted_data_by_paper_id,
+    get_paper_by_id, get_papers_by_ids, get_extracted_data_by_paper_id,
     get_topic_by_name, create_topic, add_paper_to_topic,
-    update_paper_status
+    update_paper_status, classify_papers_bulk
 )
 from database.models import SessionLocal, PaperStatus
 from utils.llm_utils import classification_llm
+from utils.embeddings import get_embedder, cosine_similarity, tokenize, HashingEmbedder
+from utils.prompt_builder import PromptBuilder
+from utils.tokens import truncate_to_tokens
+from agents.info_extraction_agent import get_section_text
 
 logger = logging.getLogger(__name__)
 
+CLASSIFICATION_MAX_TOKENS = 100
+CLASSIFICATION_PROMPT = (
+    "Given the following research paper abstract/text, classify it into one or more of "
+    "the following topics: {topics}.\n"
+    "Respond ONLY with the topic names, comma-separated. If no topic fits, respond 'None'.\n\n"
+    "Paper Title: {title}\n"
+    "Paper Abstract/Text:\n{content}\n\n"
+    "Topics:"
+)
+
+def classify_locally(title: str, text: str, topic_list: List[str]) -> Optional[List[str]]:
+    """
+    Embedding fast path: compares the paper with each topic name by cosine similarity.
+    Returns the topics scoring at least LOCAL_CLASSIFIER_MIN_SIMILARITY when the result is
+    clear-cut, or None when the paper should be escalated to the LLM: no match, a score within
+    LOCAL_CLASSIFIER_MARGIN below the threshold, or a best topic leading the runner-up by less
+    than LOCAL_CLASSIFIER_MIN_LEAD. In "local" mode it never escalates.
+    With the hashing embedder a topic also needs every one of its words in the paper, since
+    a single shared generic word (e.g. "learning") can otherwise score highly on short texts.
+    """
+    if settings.CLASSIFICATION_MODE == "llm":
+        return None
+
+    paper_text = f"{title or ''}\n{text or ''}"
+    embedder = get_embedder()
+    vectors = embedder.encode(list(topic_list) + [paper_text])
+    similarities = cosine_similarity(vectors[-1:], vectors[:-1])[0]
+    if isinstance(embedder, HashingEmbedder):
+        paper_tokens = set(tokenize(paper_text))
+        similarities = [score if set(tokenize(topic)) <= paper_tokens else 0.0 for topic, score in zip(topic_list, similarities)]
+
+    threshold = settings.LOCAL_CLASSIFIER_MIN_SIMILARITY
+    matched = [topic for topic, score in zip(topic_list, similarities) if score >= threshold]
+    if settings.CLASSIFICATION_MODE == "local":
+        return matched
+
+    ambiguous = any(threshold - settings.LOCAL_CLASSIFIER_MARGIN <= score < threshold for score in similarities)
+    ranked_scores = sorted(similarities, reverse=True) + [0.0]
+    clear_lead = ranked_scores[0] - ranked_scores[1] >= settings.LOCAL_CLASSIFIER_MIN_LEAD
+    if matched and not ambiguous and clear_lead:
+        return matched
+    return None
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def classify_paper_task(self, paper_id: int, topic_list: List[str]) -> Optional[int]:
     """
@@ -43,19 +92,25 @@ def classify_paper_task(self, paper_id: int, topic_list: List[str]) -> Optional[
             with open(extracted_data.full_text_path, 'r', encoding='utf-8') as f:
                 paper_text = f.read()
 
-            # Use abstract first, fall back to full text if abstract is too short
-            text_to_classify = paper.abstract or paper_text[:2000] # Limit full text to avoid token limits
+            # Pack the abstract, then the introduction, into the token budget; the start of the full text only if neither exists
+            sections = extracted_data.sections_json
+            builder = PromptBuilder("classification", classification_llm.model, max_output_tokens=CLASSIFICATION_MAX_TOKENS,
+                                    max_input_tokens=settings.CLASSIFICATION_MAX_INPUT_TOKENS)
+            abstract_text = paper.abstract or get_section_text(paper_text, sections, ("abstract",))
+            builder.add(abstract_text, priority=0)
+            builder.add(get_section_text(paper_text, sections, ("introduction",)), priority=1)
+            if not builder.has_content:
+                builder.add(paper_text)
+            text_to_classify = abstract_text or truncate_to_tokens(paper_text, settings.CLASSIFICATION_MAX_INPUT_TOKENS)
 
-            prompt = (
-                f"Given the following research paper abstract/text, classify it into one or more of "
-                f"the following topics: {', '.join(topic_list)}.\n"
-                "Respond ONLY with the topic names, comma-separated. If no topic fits, respond 'None'.\n\n"
-                f"Paper Title: {paper.title}\n"
-                f"Paper Abstract/Text:\n{text_to_classify}\n\n"
-                "Topics:"
-            )
-
-            classification_result = classification_llm.generate_text(prompt, max_tokens=100, temperature=0.0) # Low temperature for classification
+            # Confident embedding matches skip the LLM entirely
+            local_topics = classify_locally(paper.title, text_to_classify, topic_list)
+            if local_topics is not None:
+                classification_result = ", ".join(local_topics) or "None"
+                logger.info(f"Paper {paper.id} classified locally without an LLM call.")
+            else:
+                prompt = builder.build(CLASSIFICATION_PROMPT, topics=", ".join(topic_list), title=paper.title)
+                classification_result = classification_llm.generate_text(prompt, max_tokens=CLASSIFICATION_MAX_TOKENS, temperature=0.0) # Low temperature for classification
 
             if classification_result and classification_result.lower() != 'none':
                 classified_topics = [t.strip() for t in classification_result.split(',') if t.strip()]
@@ -77,4 +132,106 @@ def classify_paper_task(self, paper_id: int, topic_list: List[str]) -> Optional[
             logger.error(f"Error in TopicClassificationAgent for paper ID {paper.id}: {e}")
             update_paper_status(db, paper.id, PaperStatus.FAILED)
             self.retry(exc=e)
-            return None
\ No newline at end of file
+            return None
+
+def _parse_batch_classification(response: str, batch_size: int, topic_list: List[str]) -> Dict[int, List[str]]:
+    """
+    Parses a batched classification response into {paper number: [topic names]}.
+    Accepts the requested JSON object, falling back to "1: Topic A, Topic B" lines.
+    Topic names are matched case-insensitively against topic_list; unknown names are dropped.
+    """
+    canonical_topics = {t.lower(): t for t in topic_list}
+    raw_assignments = {}
+    try:
+        raw_assignments = json.loads(response[response.index('{'):response.rindex('}') + 1])
+    except ValueError:
+        for match in re.finditer(r"^\s*(?:Paper\s*)?(\d+)\s*[:.)-]\s*(.*)$", response, re.MULTILINE):
+            raw_assignments[match.group(1)] = match.group(2).split(',')
+
+    assignments = {}
+    for number, names in raw_assignments.items():
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= number <= batch_size:
+            continue
+        if isinstance(names, str):
+            names = names.split(',')
+        matched = [canonical_topics[n.strip().lower()] for n in names if isinstance(n, str) and n.strip().lower() in canonical_topics]
+        assignments[number] = list(dict.fromkeys(matched))
+    return assignments
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def classify_papers_batch_task(self, paper_ids: List[int], topic_list: List[str]) -> List[int]:
+    """
+    Classifies many papers with one LLM request per batch of CLASSIFICATION_BATCH_SIZE papers,
+    sharing the topic list and instructions across the batch. All topic associations are
+    written in a single transaction. Returns the IDs of papers assigned to at least one topic.
+    """
+    if not topic_list or not paper_ids:
+        logger.warning("No topics or papers provided for batch classification. Skipping.")
+        return []
+
+    batch_size = max(1, settings.CLASSIFICATION_BATCH_SIZE)
+    classified_paper_ids = []
+    with SessionLocal() as db:
+        papers = {p.id: p for p in get_papers_by_ids(db, paper_ids)}
+        ordered_papers = [papers[p_id] for p_id in dict.fromkeys(paper_ids) if p_id in papers]
+
+        try:
+            assignments = {}
+            texts = {}
+            escalated_papers = []
+            for paper in ordered_papers:
+                text_to_classify = paper.abstract
+                if not text_to_classify:
+                    extracted_data = get_extracted_data_by_paper_id(db, paper.id)
+                    if extracted_data and extracted_data.full_text_path and extracted_data.sections_json:
+                        with open(extracted_data.full_text_path, 'r', encoding='utf-8') as f:
+                            text_to_classify = get_section_text(f.read(), extracted_data.sections_json, ("abstract", "introduction"),
+                                                                max_chars=settings.CLASSIFICATION_BATCH_TEXT_CHARS)
+                    if not text_to_classify and extracted_data and extracted_data.full_text_path:
+                        with open(extracted_data.full_text_path, 'r', encoding='utf-8') as f:
+                            text_to_classify = f.read(settings.CLASSIFICATION_BATCH_TEXT_CHARS)
+                texts[paper.id] = (text_to_classify or "")[:settings.CLASSIFICATION_BATCH_TEXT_CHARS]
+
+                # Confident embedding matches skip the LLM; only ambiguous papers are batched
+                local_topics = classify_locally(paper.title, texts[paper.id], topic_list)
+                if local_topics is not None:
+                    assignments[paper.id] = local_topics
+                else:
+                    escalated_papers.append(paper)
+            logger.info(f"{len(ordered_papers) - len(escalated_papers)} of {len(ordered_papers)} papers classified locally.")
+
+            for start in range(0, len(escalated_papers), batch_size):
+                batch = escalated_papers[start:start + batch_size]
+                paper_blocks = []
+                for number, paper in enumerate(batch, start=1):
+                    paper_blocks.append(f"Paper {number}\nTitle: {paper.title}\nAbstract/Text:\n{texts[paper.id]}")
+
+                prompt = (
+                    f"Classify each of the following research papers into one or more of "
+                    f"the following topics: {', '.join(topic_list)}.\n"
+                    "Respond ONLY with a JSON object mapping each paper number to a list of topic names, "
+                    'for example {"1": ["Topic A"], "2": []}. Use an empty list if no topic fits.\n\n'
+                    + "\n\n".join(paper_blocks) +
+                    "\n\nJSON:"
+                )
+                classification_result = classification_llm.generate_text(prompt, max_tokens=30 * len(batch) + 50, temperature=0.0)
+                if not classification_result:
+                    logger.warning(f"Empty batch classification response for papers {[p.id for p in batch]}.")
+                    continue
+
+                for number, topic_names in _parse_batch_classification(classification_result, len(batch), topic_list).items():
+                    assignments[batch[number - 1].id] = topic_names
+
+            classify_papers_bulk(db, assignments)
+            classified_paper_ids = [paper_id for paper_id, topic_names in assignments.items() if topic_names]
+            logger.info(f"Batch classified {len(classified_paper_ids)} of {len(ordered_papers)} papers into topics: {', '.join(topic_list)}")
+            return classified_paper_ids
+
+        except Exception as e:
+            logger.error(f"Error in TopicClassificationAgent batch classification for papers {paper_ids}: {e}")
+            self.retry(exc=e)
+            return []
\ No newline at end of file
@@ -17,6 +17,12 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./data/database.db")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5)) # Connections kept open per worker process
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800)) # Server databases only
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 30000)) # How long SQLite writers wait for the lock
+    FULLTEXT_INDEX_ENABLED: bool = os.getenv("FULLTEXT_INDEX_ENABLED", "true").lower() == "true" # SQLite FTS5 index for local search
+    FULLTEXT_SEARCH_LIMIT: int = int(os.getenv("FULLTEXT_SEARCH_LIMIT", 20)) # Results shown by the local search menu
 
     # Celery
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0") # "redis" is the service name in docker-compose
@@ -28,13 +34,117 @@ class Settings(BaseSettings):
     PROCESSED_TEXTS_DIR: str = os.path.join(BASE_DATA_DIR, "processed_texts")
     SUMMARIES_DIR: str = os.path.join(BASE_DATA_DIR, "summaries")
     AUDIO_PODCASTS_DIR: str = os.path.join(BASE_DATA_DIR, "audio_podcasts")
+    CONTENT_STORE_DIR: str = os.path.join(PROCESSED_TEXTS_DIR, "by_hash") # Extracted text keyed by source content hash
+
+    # Content store size limits in bytes (0 disables eviction)
+    RAW_PAPERS_MAX_BYTES: int = int(os.getenv("RAW_PAPERS_MAX_BYTES", 5 * 1024**3))
+    PROCESSED_TEXTS_MAX_BYTES: int = int(os.getenv("PROCESSED_TEXTS_MAX_BYTES", 2 * 1024**3))
 
     # ... (LLM Models, Default Search Params)
+    LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "") # OpenAI-compatible endpoint, e.g. OpenRouter; empty uses OpenAI
+    CLASSIFICATION_LLM_MODEL: str = os.getenv("CLASSIFICATION_LLM_MODEL", "gpt-4o-mini")
+    SUMMARY_LLM_MODEL: str = os.getenv("SUMMARY_LLM_MODEL", "gpt-4o-mini")
+    SYNTHESIS_LLM_MODEL: str = os.getenv("SYNTHESIS_LLM_MODEL", "gpt-4o")
+    # Prompt token budgets: context window per model (prefixes match dated versions), used by utils/prompt_builder
+    LLM_CONTEXT_WINDOWS: str = os.getenv("LLM_CONTEXT_WINDOWS", "gpt-4o=128000,gpt-4-turbo=128000,gpt-4=8192,gpt-3.5-turbo=16385")
+    LLM_DEFAULT_CONTEXT_WINDOW: int = int(os.getenv("LLM_DEFAULT_CONTEXT_WINDOW", 8192)) # Models not listed above
+    PROMPT_SAFETY_MARGIN_TOKENS: int = int(os.getenv("PROMPT_SAFETY_MARGIN_TOKENS", 256)) # Headroom for tokenizer differences
+    DEFAULT_SEARCH_LIMIT: int = int(os.getenv("DEFAULT_SEARCH_LIMIT", 10))
+    SEARCH_SOURCES: str = os.getenv("SEARCH_SOURCES", "semantic_scholar,arxiv,crossref") # Queried concurrently and merged
+    SEARCH_SOURCE_TIMEOUT_SECONDS: int = int(os.getenv("SEARCH_SOURCE_TIMEOUT_SECONDS", 20)) # Slower sources are dropped from the results
+    SEARCH_OFFLINE: bool = os.getenv("SEARCH_OFFLINE", "false").lower() == "true" # Answer from saved API responses instead of the network
+    SEARCH_PAGE_SIZE: int = int(os.getenv("SEARCH_PAGE_SIZE", 10)) # Results per source per page; larger searches are paginated
+    SEARCH_CACHE_ENABLED: bool = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+    SEARCH_CACHE_PATH: str = os.getenv("SEARCH_CACHE_PATH", os.path.join(BASE_DATA_DIR, "search_cache.db"))
+    SEARCH_CACHE_TTL_SECONDS: int = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", 6 * 3600))
+    SEARCH_FIXTURES_DIR: str = os.getenv("SEARCH_FIXTURES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "search_fixtures"))
+
+    CLASSIFICATION_BATCH_SIZE: int = int(os.getenv("CLASSIFICATION_BATCH_SIZE", 20)) # Papers per batched classification prompt; 1 disables batching
+    CLASSIFICATION_BATCH_TEXT_CHARS: int = int(os.getenv("CLASSIFICATION_BATCH_TEXT_CHARS", 1500)) # Per-paper text limit in batched prompts
+    CLASSIFICATION_MAX_INPUT_TOKENS: int = int(os.getenv("CLASSIFICATION_MAX_INPUT_TOKENS", 600)) # Single-paper classification prompt
+
+    # Local classification fast path: "llm" (always ask the LLM), "hybrid" (embed first, escalate
+    # ambiguous papers to the LLM) or "local" (embedding matches only, no network).
+    # Off by default: calibrate the threshold on your topics (ideally with sentence-transformers) before enabling it
+    CLASSIFICATION_MODE: str = os.getenv("CLASSIFICATION_MODE", "llm")
+    LOCAL_CLASSIFIER_MIN_SIMILARITY: float = float(os.getenv("LOCAL_CLASSIFIER_MIN_SIMILARITY", 0.6)) # Cosine similarity needed to assign a topic
+    LOCAL_CLASSIFIER_MARGIN: float = float(os.getenv("LOCAL_CLASSIFIER_MARGIN", 0.05)) # Scores this close below the threshold are ambiguous
+    LOCAL_CLASSIFIER_MIN_LEAD: float = float(os.getenv("LOCAL_CLASSIFIER_MIN_LEAD", 0.15)) # Best topic must beat the runner-up by this much to skip the LLM
+
+    # Local embeddings
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "hashing") # "hashing" or "sentence-transformers"
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2") # Used by the sentence-transformers backend
+    EMBEDDING_DIM: int = int(os.getenv("EMBEDDING_DIM", 2048)) # Used by the hashing backend
+    # Vector index: memory-mapped paper and summary embeddings for related papers and synthesis selection
+    VECTOR_INDEX_ENABLED: bool = os.getenv("VECTOR_INDEX_ENABLED", "true").lower() == "true"
+    VECTOR_INDEX_DIR: str = os.getenv("VECTOR_INDEX_DIR", os.path.join(BASE_DATA_DIR, "vector_index"))
+    VECTOR_INDEX_IVF_MIN_VECTORS: int = int(os.getenv("VECTOR_INDEX_IVF_MIN_VECTORS", 20000)) # Smaller stores are scanned exhaustively; 0 disables IVF
+    VECTOR_INDEX_IVF_NPROBE: int = int(os.getenv("VECTOR_INDEX_IVF_NPROBE", 8)) # IVF lists scanned per query
+    RELATED_PAPERS_COUNT: int = int(os.getenv("RELATED_PAPERS_COUNT", 5))
+
+    # Individual summaries: "map_reduce" summarizes long papers chunk by chunk, "sections" sends only the abstract,
+    # introduction and conclusion (map_reduce when they can't be found), "truncate" uses about 1000 tokens of them
+    # or of the abstract / start of the text
+    SUMMARY_MODE: str = os.getenv("SUMMARY_MODE", "map_reduce")
+    SUMMARY_MAX_INPUT_TOKENS: int = int(os.getenv("SUMMARY_MAX_INPUT_TOKENS", 4000)) # Final summary prompt
+    SUMMARY_CHUNK_TOKENS: int = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000)) # Tokens per chunk in the map step
+    SUMMARY_CHUNK_SUMMARY_TOKENS: int = int(os.getenv("SUMMARY_CHUNK_SUMMARY_TOKENS", 200)) # Max tokens per chunk summary
+    SUMMARY_MAP_CONCURRENCY: int = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 4)) # Concurrent LLM calls in the map step
+
+    # Cross-paper synthesis: "incremental" folds only newly added papers into the topic's latest synthesis, "full" rebuilds it
+    SYNTHESIS_MODE: str = os.getenv("SYNTHESIS_MODE", "incremental")
+    SYNTHESIS_MAX_INPUT_TOKENS: int = int(os.getenv("SYNTHESIS_MAX_INPUT_TOKENS", 6000)) # Larger summary sets are tree-reduced over paper clusters
+    SYNTHESIS_TOP_K: int = int(os.getenv("SYNTHESIS_TOP_K", 20)) # Most relevant new papers per synthesis, by vector similarity to the topic; 0 uses all
+
+    # LLM response cache
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "sqlite") # "sqlite" or "disk"
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DATA_DIR, "llm_cache.db")) # File for sqlite, directory for disk
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+    LLM_CACHE_BYPASS_NONDETERMINISTIC: bool = os.getenv("LLM_CACHE_BYPASS_NONDETERMINISTIC", "true").lower() == "true" # Skip the cache when temperature > 0
+
+    # Summaries and syntheses are streamed into their files as the LLM writes them
+    LLM_STREAMING_ENABLED: bool = os.getenv("LLM_STREAMING_ENABLED", "true").lower() == "true"
+
+    # PDF Parsing
+    PDF_PARSE_WORKERS: int = int(os.getenv("PDF_PARSE_WORKERS", os.cpu_count() or 1)) # Size of the page-range process pool
+    PDF_PARSE_PAGES_PER_CHUNK: int = int(os.getenv("PDF_PARSE_PAGES_PER_CHUNK", 50))
+    PDF_PARSE_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARSE_PARALLEL_MIN_PAGES", 100)) # Smaller PDFs are parsed inline
+    # Section, keyword and caption extraction (rule-based, no LLM)
+    INFO_EXTRACTION_ENABLED: bool = os.getenv("INFO_EXTRACTION_ENABLED", "true").lower() == "true"
+    INFO_EXTRACTION_MAX_PDF_PAGES: int = int(os.getenv("INFO_EXTRACTION_MAX_PDF_PAGES", 60)) # Pages scanned for heading fonts
+    KEYWORDS_PER_PAPER: int = int(os.getenv("KEYWORDS_PER_PAPER", 10))
+
+    # HTTP fetching (pooled keep-alive session shared by the web scraper)
+    HTTP_TIMEOUT_SECONDS: int = int(os.getenv("HTTP_TIMEOUT_SECONDS", 10))
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 4))
+    HTTP_FETCH_CONCURRENCY: int = int(os.getenv("HTTP_FETCH_CONCURRENCY", 16)) # Concurrent DOI lookups in resolve_dois and HTTP connection pools kept
+    # HTML-to-text: "auto" (selectolax, else lxml, else BeautifulSoup), "selectolax", "lxml", "beautifulsoup"
+    # or "stream" (regex tokenizer, lowest memory, but misses nested boilerplate elements)
+    HTML_EXTRACTION_BACKEND: str = os.getenv("HTML_EXTRACTION_BACKEND", "auto")
+
+    # DOI -> URL resolution cache
+    DOI_CACHE_ENABLED: bool = os.getenv("DOI_CACHE_ENABLED", "true").lower() == "true"
+    DOI_CACHE_PATH: str = os.getenv("DOI_CACHE_PATH", os.path.join(BASE_DATA_DIR, "doi_cache.db"))
+    DOI_CACHE_TTL_SECONDS: int = int(os.getenv("DOI_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+    DOI_CACHE_NEGATIVE_TTL_SECONDS: int = int(os.getenv("DOI_CACHE_NEGATIVE_TTL_SECONDS", 24 * 3600)) # DOIs that could not be resolved
+
+    # Per-host/API token-bucket rate limits shared across workers ("sqlite" file or "redis")
+    RATE_LIMITER_ENABLED: bool = os.getenv("RATE_LIMITER_ENABLED", "true").lower() == "true"
+    RATE_LIMITER_BACKEND: str = os.getenv("RATE_LIMITER_BACKEND", "sqlite")
+    RATE_LIMITER_PATH: str = os.getenv("RATE_LIMITER_PATH", os.path.join(BASE_DATA_DIR, "rate_limits.db"))
+    RATE_LIMITER_REDIS_URL: str = os.getenv("RATE_LIMITER_REDIS_URL", "") # Defaults to CELERY_BROKER_URL
+    # Requests per second by host or API name ("llm" covers every "llm:<model>" key); 0 means unlimited
+    RATE_LIMITS: str = os.getenv("RATE_LIMITS", "api.semanticscholar.org=1,api.crossref.org=10,export.arxiv.org=0.33,llm=5")
+    RATE_LIMIT_DEFAULT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_DEFAULT_PER_SECOND", 2)) # Hosts not listed in RATE_LIMITS
+    RATE_LIMIT_BURST_SECONDS: float = float(os.getenv("RATE_LIMIT_BURST_SECONDS", 1)) # Bucket size as seconds of quota
 
     def create_directories(self):
         # These paths are relative to the container's /app/data directory
         os.makedirs(self.RAW_PAPERS_DIR, exist_ok=True)
         os.makedirs(self.PROCESSED_TEXTS_DIR, exist_ok=True)
+        os.makedirs(self.CONTENT_STORE_DIR, exist_ok=True)
         os.makedirs(self.SUMMARIES_DIR, exist_ok=True)
         os.makedirs(self.AUDIO_PODCASTS_DIR, exist_ok=True)
 
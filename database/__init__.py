@@ -1,12 +1,51 @@
 # database/__init__.py
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 from config import settings
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Runs on every new SQLite connection. WAL lets readers proceed while a worker writes,
+    busy_timeout makes writers wait for the lock instead of failing with "database is locked",
+    and synchronous=NORMAL is safe under WAL while avoiding an fsync per commit.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def create_db_engine(database_url: str = None):
+    """Creates an engine with pool sizing, pre-ping and backend-specific tuning."""
+    database_url = database_url or settings.DATABASE_URL
+    url = make_url(database_url)
+    engine_kwargs = {"pool_pre_ping": True}
+
+    if url.get_backend_name() == "sqlite":
+        engine_kwargs["connect_args"] = {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if url.database not in (None, "", ":memory:"): # In-memory databases use a single shared connection
+            engine_kwargs.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+        db_engine = create_engine(database_url, **engine_kwargs)
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    else:
+        engine_kwargs.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS
+        )
+        db_engine = create_engine(database_url, **engine_kwargs)
+
+    # Forked Celery/pool workers must not reuse the parent's pooled connections; give each child its own pool
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: db_engine.dispose(close=False))
+    return db_engine
+
 # Create the SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL)
+engine = create_db_engine()
 
 # Create a SessionLocal class to get new database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,14 +1,83 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, update, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from typing import List, Optional, Tuple
 import json
+import logging
+import re
+
+from config import settings
 
 from database.models import Paper, Topic, PaperTopic, Summary, ExtractedData, Citation, PaperStatus, SummaryType
 from database.models import SessionLocal # Import SessionLocal for direct use in functions
 
+logger = logging.getLogger(__name__)
+
 def get_paper_by_id(db: Session, paper_id: int):
     return db.query(Paper).filter(Paper.id == paper_id).first()
 
+IN_CLAUSE_BATCH_SIZE = 500 # Keeps IN (...) lists below SQLite's bound-parameter limit
+
+def _batched(ids: List[int], size: int = IN_CLAUSE_BATCH_SIZE):
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def _save(db: Session, commit: bool, instance=None):
+    """
+    Commits and refreshes instance, or with commit=False only flushes, leaving the commit to a
+    caller that groups several writes in one transaction (see agents.base_agent.unit_of_work).
+    """
+    if commit:
+        db.commit()
+        if instance is not None:
+            db.refresh(instance)
+    else:
+        db.flush()
+
+def get_papers_by_ids(db: Session, paper_ids: List[int]):
+    papers = []
+    for batch in _batched(paper_ids):
+        papers.extend(db.query(Paper).filter(Paper.id.in_(batch)).all())
+    return papers
+
+def get_individual_summaries_for_papers(db: Session, paper_ids: List[int]) -> dict:
+    """Returns {paper_id: latest individual Summary} for the given papers, one query per batch of IDs."""
+    summaries = {}
+    for batch in _batched(paper_ids):
+        for summary in db.query(Summary).filter(
+            Summary.paper_id.in_(batch),
+            Summary.summary_type == SummaryType.INDIVIDUAL_PAPER
+        ).order_by(Summary.id):
+            summaries[summary.paper_id] = summary
+    return summaries
+
+def get_citations_for_papers(db: Session, paper_ids: List[int]) -> dict:
+    """Returns {paper_id: [Citation, ...]} for the given papers, one query per batch of IDs."""
+    citations = {}
+    for batch in _batched(paper_ids):
+        for citation in db.query(Citation).filter(Citation.paper_id.in_(batch)).order_by(Citation.id):
+            citations.setdefault(citation.paper_id, []).append(citation)
+    return citations
+
+def get_topics_with_papers_and_summaries(db: Session):
+    """
+    Fetches every topic with its papers, the papers' summaries and the topic's own
+    summaries eagerly loaded, in a constant number of queries.
+    """
+    return db.query(Topic).options(
+        selectinload(Topic.papers).selectinload(Paper.summaries),
+        selectinload(Topic.summaries)
+    ).order_by(Topic.name).all()
+
+def get_referenced_file_paths(db: Session, paths: List[str]) -> set:
+    """Returns the given paths that a paper (local_path) or extracted data (full_text_path) still points to."""
+    referenced = set()
+    for batch in _batched(paths):
+        referenced.update(path for (path,) in db.query(Paper.local_path).filter(Paper.local_path.in_(batch)))
+        referenced.update(path for (path,) in db.query(ExtractedData.full_text_path).filter(ExtractedData.full_text_path.in_(batch)))
+    return referenced
+
 def get_paper_by_doi(db: Session, doi: str):
     return db.query(Paper).filter(Paper.doi == doi).first()
 
@@ -31,6 +100,7 @@ def create_paper(
 ):
     db_paper = Paper(
         title=title,
+        normalized_title=normalize_title(title) if title else None,
         abstract=abstract,
         authors=authors,
         publication_year=publication_year,
@@ -44,14 +114,104 @@ def create_paper(
     db.refresh(db_paper)
     return db_paper
 
-def update_paper_status(db: Session, paper_id: int, new_status: PaperStatus):
+def normalize_title(title: Optional[str]) -> str:
+    """Lowercases a title and strips punctuation and extra whitespace for duplicate detection."""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", (title or "").lower()).split())
+
+CREATE_PAPERS_BULK_ATTEMPTS = 3
+
+def create_papers_bulk(db: Session, papers_data: List[dict], status: PaperStatus = PaperStatus.PENDING) -> List[Tuple[int, bool]]:
+    """
+    Inserts a batch of search results in a single transaction.
+    Papers are deduplicated on DOI and on normalized title + year, both within the batch and
+    against existing rows. Returns one (paper_id, created) pair per input entry, where created
+    is False for papers that already existed.
+    If another worker inserts one of the DOIs concurrently, the transaction is rolled back and
+    the batch retried, so the conflicting entries resolve to the other worker's rows instead of
+    failing the whole batch. (Per-row savepoints are not used: with pysqlite, releasing a
+    savepoint that opened the transaction commits it.)
+    """
+    for attempt in range(1, CREATE_PAPERS_BULK_ATTEMPTS + 1):
+        try:
+            return _create_papers_bulk(db, papers_data, status)
+        except IntegrityError as e:
+            db.rollback()
+            if attempt == CREATE_PAPERS_BULK_ATTEMPTS:
+                raise
+            logger.info(f"Concurrent insert of a paper in the batch ({e.orig}); retrying against the new rows.")
+
+def _create_papers_bulk(db: Session, papers_data: List[dict], status: PaperStatus) -> List[Tuple[int, bool]]:
+    dois = {p['doi'].lower() for p in papers_data if p.get('doi')}
+    titles = {normalize_title(p['title']) for p in papers_data if p.get('title')}
+
+    # Two batched lookups find every existing paper matching the batch by DOI or title
+    by_doi = {}
+    for batch in _batched(list(dois)):
+        for paper_id, doi in db.query(Paper.id, Paper.doi).filter(func.lower(Paper.doi).in_(batch)):
+            by_doi[doi.lower()] = paper_id
+    by_title_year = {}
+    for batch in _batched(list(titles)):
+        for paper_id, normalized_title, year in db.query(Paper.id, Paper.normalized_title, Paper.publication_year).filter(Paper.normalized_title.in_(batch)):
+            by_title_year[(normalized_title, year)] = paper_id
+
+    results = [] # (paper id or pending Paper, created)
+    new_papers = []
+    for paper_data in papers_data:
+        doi_key = paper_data['doi'].lower() if paper_data.get('doi') else None
+        title_key = (normalize_title(paper_data.get('title')), paper_data.get('publication_year')) if paper_data.get('title') else None
+
+        existing = by_doi.get(doi_key) if doi_key else None
+        if existing is None and title_key:
+            existing = by_title_year.get(title_key)
+        if existing is not None:
+            results.append((existing, False))
+            continue
+
+        db_paper = Paper(
+            title=paper_data.get('title'),
+            normalized_title=title_key[0] if title_key else None,
+            abstract=paper_data.get('abstract'),
+            authors=paper_data.get('authors'),
+            publication_year=paper_data.get('publication_year'),
+            doi=paper_data.get('doi'),
+            url=paper_data.get('url'),
+            local_path=paper_data.get('local_path'),
+            status=status
+        )
+        new_papers.append(db_paper)
+        results.append((db_paper, True))
+        # Later duplicates in the same batch resolve to this paper
+        if doi_key:
+            by_doi[doi_key] = db_paper
+        if title_key:
+            by_title_year[title_key] = db_paper
+
+    if new_papers:
+        db.add_all(new_papers)
+        db.flush() # Assigns primary keys without a per-row commit
+    results = [(ref.id if isinstance(ref, Paper) else ref, created) for ref, created in results]
+    db.commit()
+    return results
+
+def update_paper_status(db: Session, paper_id: int, new_status: PaperStatus, commit: bool = True):
     db_paper = db.query(Paper).filter(Paper.id == paper_id).first()
     if db_paper:
         db_paper.status = new_status
-        db.commit()
-        db.refresh(db_paper)
+        _save(db, commit, db_paper)
     return db_paper
 
+def update_papers_status_bulk(db: Session, paper_ids: List[int], new_status: PaperStatus) -> int:
+    """
+    Sets the status of many papers with one UPDATE per batch of IDs and a single commit,
+    instead of loading and committing each paper. Returns the number of papers updated.
+    """
+    updated = 0
+    for batch in _batched(list(dict.fromkeys(paper_ids))):
+        result = db.execute(update(Paper).where(Paper.id.in_(batch)).values(status=new_status))
+        updated += result.rowcount
+    db.commit()
+    return updated
+
 def update_paper_details(
     db: Session,
     paper_id: int,
@@ -62,11 +222,14 @@ def update_paper_details(
     doi: Optional[str] = None,
     url: Optional[str] = None,
     local_path: Optional[str] = None,
-    status: Optional[PaperStatus] = None
+    status: Optional[PaperStatus] = None,
+    commit: bool = True
 ):
     db_paper = db.query(Paper).filter(Paper.id == paper_id).first()
     if db_paper:
-        if title: db_paper.title = title
+        if title:
+            db_paper.title = title
+            db_paper.normalized_title = normalize_title(title)
         if abstract: db_paper.abstract = abstract
         if authors: db_paper.authors = authors
         if publication_year: db_paper.publication_year = publication_year
@@ -74,8 +237,7 @@ def update_paper_details(
         if url: db_paper.url = url
         if local_path: db_paper.local_path = local_path
         if status: db_paper.status = status
-        db.commit()
-        db.refresh(db_paper)
+        _save(db, commit, db_paper)
     return db_paper
 
 def get_topic_by_id(db: Session, topic_id: int):
@@ -106,6 +268,40 @@ def add_paper_to_topic(db: Session, paper_id: int, topic_id: int):
         db.commit()
     return True
 
+def classify_papers_bulk(db: Session, assignments: dict) -> int:
+    """
+    Stores topic assignments {paper_id: [topic names]} for many papers in one transaction:
+    creates missing topics, inserts missing PaperTopic rows and marks newly classified papers
+    (those still PROCESSED) as CLASSIFIED. Returns the number of associations added.
+    """
+    topic_names = {name for names in assignments.values() for name in names}
+    if not topic_names:
+        return 0
+
+    topics = {t.name.lower(): t for t in db.query(Topic).filter(func.lower(Topic.name).in_([n.lower() for n in topic_names]))}
+    for name in topic_names:
+        if name.lower() not in topics:
+            topics[name.lower()] = Topic(name=name)
+            db.add(topics[name.lower()])
+    db.flush() # Assigns IDs to new topics
+
+    paper_ids = [paper_id for paper_id, names in assignments.items() if names]
+    existing_links = set(db.query(PaperTopic.paper_id, PaperTopic.topic_id).filter(PaperTopic.paper_id.in_(paper_ids)))
+    new_links = []
+    for paper_id in paper_ids:
+        for name in assignments[paper_id]:
+            link = (paper_id, topics[name.lower()].id)
+            if link not in existing_links:
+                existing_links.add(link)
+                new_links.append(PaperTopic(paper_id=link[0], topic_id=link[1]))
+    db.add_all(new_links)
+
+    db.query(Paper).filter(Paper.id.in_(paper_ids), Paper.status == PaperStatus.PROCESSED).update(
+        {Paper.status: PaperStatus.CLASSIFIED}, synchronize_session=False
+    )
+    db.commit()
+    return len(new_links)
+
 def get_papers_by_topic(db: Session, topic_id: int):
     return db.query(Paper).join(PaperTopic).filter(PaperTopic.topic_id == topic_id).all()
 
@@ -119,20 +315,28 @@ def create_summary(
     content: str,
     paper_id: Optional[int] = None,
     topic_id: Optional[int] = None,
-    audio_path: Optional[str] = None
+    audio_path: Optional[str] = None,
+    covered_paper_ids: Optional[List[int]] = None,
+    commit: bool = True
 ):
     db_summary = Summary(
         summary_type=summary_type,
         content=content,
         paper_id=paper_id,
         topic_id=topic_id,
-        audio_path=audio_path
+        audio_path=audio_path,
+        covered_paper_ids_json=json.dumps(sorted(covered_paper_ids)) if covered_paper_ids else None
     )
     db.add(db_summary)
-    db.commit()
-    db.refresh(db_summary)
+    _save(db, commit, db_summary)
     return db_summary
 
+def get_latest_topic_synthesis(db: Session, topic_id: int):
+    return db.query(Summary).filter(
+        Summary.topic_id == topic_id,
+        Summary.summary_type == SummaryType.CROSS_PAPER_SYNTHESIS
+    ).order_by(Summary.id.desc()).first()
+
 def update_summary_audio_path(db: Session, summary_id: int, audio_path: str):
     db_summary = db.query(Summary).filter(Summary.id == summary_id).first()
     if db_summary:
@@ -148,7 +352,8 @@ def create_extracted_data(
     sections_json: Optional[dict] = None, # Pass dict, convert to JSON internally
     keywords_json: Optional[list] = None,
     figures_info_json: Optional[list] = None,
-    tables_info_json: Optional[list] = None
+    tables_info_json: Optional[list] = None,
+    commit: bool = True
 ):
     db_extracted_data = ExtractedData(
         paper_id=paper_id,
@@ -159,13 +364,55 @@ def create_extracted_data(
         tables_info_json=json.dumps(tables_info_json) if tables_info_json else None
     )
     db.add(db_extracted_data)
-    db.commit()
-    db.refresh(db_extracted_data)
+    _save(db, commit, db_extracted_data)
     return db_extracted_data
 
 def get_extracted_data_by_paper_id(db: Session, paper_id: int):
     return db.query(ExtractedData).filter(ExtractedData.paper_id == paper_id).first()
 
+def get_extracted_data_by_text_path(db: Session, full_text_path: str):
+    return db.query(ExtractedData).filter(ExtractedData.full_text_path == full_text_path).first()
+
+def update_extracted_data(
+    db: Session,
+    paper_id: int,
+    full_text_path: Optional[str] = None,
+    sections_json: Optional[dict] = None,
+    keywords_json: Optional[list] = None,
+    figures_info_json: Optional[list] = None,
+    tables_info_json: Optional[list] = None,
+    commit: bool = True
+):
+    db_extracted_data = db.query(ExtractedData).filter(ExtractedData.paper_id == paper_id).first()
+    if db_extracted_data:
+        if full_text_path and full_text_path != db_extracted_data.full_text_path:
+            # Sections hold character offsets into the old text; nothing derived from it carries over
+            db_extracted_data.full_text_path = full_text_path
+            db_extracted_data.sections_json = None
+            db_extracted_data.keywords_json = None
+            db_extracted_data.figures_info_json = None
+            db_extracted_data.tables_info_json = None
+        if sections_json: db_extracted_data.sections_json = json.dumps(sections_json)
+        if keywords_json: db_extracted_data.keywords_json = json.dumps(keywords_json)
+        if figures_info_json: db_extracted_data.figures_info_json = json.dumps(figures_info_json)
+        if tables_info_json: db_extracted_data.tables_info_json = json.dumps(tables_info_json)
+        _save(db, commit, db_extracted_data)
+    return db_extracted_data
+
+def copy_extracted_data(db: Session, source: ExtractedData, paper_id: int, commit: bool = True):
+    """Creates ExtractedData for paper_id that reuses everything already extracted from identical content."""
+    db_extracted_data = ExtractedData(
+        paper_id=paper_id,
+        full_text_path=source.full_text_path,
+        sections_json=source.sections_json,
+        keywords_json=source.keywords_json,
+        figures_info_json=source.figures_info_json,
+        tables_info_json=source.tables_info_json
+    )
+    db.add(db_extracted_data)
+    _save(db, commit, db_extracted_data)
+    return db_extracted_data
+
 def create_citation(
     db: Session,
     paper_id: int,
@@ -175,7 +422,8 @@ def create_citation(
     authors: Optional[str] = None,
     title: Optional[str] = None,
     year: Optional[int] = None,
-    journal_conf: Optional[str] = None
+    journal_conf: Optional[str] = None,
+    commit: bool = True
 ):
     db_citation = Citation(
         paper_id=paper_id,
@@ -188,6 +436,119 @@ def create_citation(
         journal_conf=journal_conf
     )
     db.add(db_citation)
+    _save(db, commit, db_citation)
+    return db_citation
+
+# Full-text search over the local corpus (SQLite FTS5 table created by database.migrations)
+FULLTEXT_TABLE = "paper_search"
+FULLTEXT_COLUMNS = ("title", "abstract", "full_text", "summaries")
+FULLTEXT_COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 3.0) # BM25 weight per column: title matches count most
+
+def fulltext_index_available(db: Session) -> bool:
+    """True when full-text search is enabled and the database is SQLite (FTS5)."""
+    return settings.FULLTEXT_INDEX_ENABLED and db.get_bind().dialect.name == "sqlite"
+
+def _read_text_file(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError as e:
+        logger.warning(f"Could not read {path} for the full-text index: {e}")
+        return None
+
+def index_paper_fulltext(
+    db: Session,
+    paper_id: int,
+    title: Optional[str] = None,
+    abstract: Optional[str] = None,
+    full_text: Optional[str] = None,
+    summaries: Optional[str] = None,
+    commit: bool = True
+) -> bool:
+    """
+    Adds or updates a paper's row in the full-text index. Columns passed as None keep their
+    indexed value, so ingestion and summarization can each update only what they produced.
+    Returns False if the index is unavailable.
+    """
+    if not fulltext_index_available(db):
+        return False
+    new_values = {"title": title, "abstract": abstract, "full_text": full_text, "summaries": summaries}
+    try:
+        row = db.execute(
+            text(f"SELECT {', '.join(FULLTEXT_COLUMNS)} FROM {FULLTEXT_TABLE} WHERE rowid = :paper_id"),
+            {"paper_id": paper_id}
+        ).first()
+        values = dict(zip(FULLTEXT_COLUMNS, row or ("",) * len(FULLTEXT_COLUMNS)))
+        values.update({column: value for column, value in new_values.items() if value is not None})
+        # FTS5 rows are replaced rather than updated in place
+        db.execute(text(f"DELETE FROM {FULLTEXT_TABLE} WHERE rowid = :paper_id"), {"paper_id": paper_id})
+        db.execute(
+            text(f"INSERT INTO {FULLTEXT_TABLE} (rowid, {', '.join(FULLTEXT_COLUMNS)}) "
+                 f"VALUES (:paper_id, {', '.join(':' + c for c in FULLTEXT_COLUMNS)})"),
+            {"paper_id": paper_id, **values}
+        )
+        _save(db, commit)
+        return True
+    except OperationalError as e:
+        logger.warning(f"Full-text index update failed for paper {paper_id}: {e}")
+        return False
+
+def rebuild_fulltext_index(db: Session) -> int:
+    """Re-indexes every paper from the database and its extracted text file. Returns the number of papers indexed."""
+    if not fulltext_index_available(db):
+        return 0
+    papers = db.query(Paper).options(selectinload(Paper.summaries)).all()
+    extracted_data = {e.paper_id: e for e in db.query(ExtractedData).all()}
+    rows = []
+    for paper in papers:
+        paper_extracted_data = extracted_data.get(paper.id)
+        rows.append({
+            "paper_id": paper.id,
+            "title": paper.title or "",
+            "abstract": paper.abstract or "",
+            "full_text": _read_text_file(paper_extracted_data.full_text_path if paper_extracted_data else None) or "",
+            "summaries": "\n\n".join(s.content for s in paper.summaries if s.summary_type == SummaryType.INDIVIDUAL_PAPER)
+        })
+    db.execute(text(f"DELETE FROM {FULLTEXT_TABLE}"))
+    if rows:
+        db.execute(
+            text(f"INSERT INTO {FULLTEXT_TABLE} (rowid, {', '.join(FULLTEXT_COLUMNS)}) "
+                 f"VALUES (:paper_id, {', '.join(':' + c for c in FULLTEXT_COLUMNS)})"),
+            rows
+        )
     db.commit()
-    db.refresh(db_citation)
-    return db_citation
\ No newline at end of file
+    return len(rows)
+
+def _fulltext_match_query(query: str) -> str:
+    """Turns free text into an FTS5 query matching all terms; a trailing * keeps prefix matching."""
+    terms = re.findall(r"\w+\*?", query)
+    return " ".join(f'"{term.rstrip("*")}"' + ("*" if term.endswith("*") else "") for term in terms)
+
+def search_papers_fulltext(
+    db: Session,
+    query: str,
+    limit: int = 20,
+    highlight: Tuple[str, str] = ("**", "**")
+) -> List[Tuple[Paper, float, str]]:
+    """
+    Searches titles, abstracts, extracted text and summaries of local papers, best BM25 match first.
+    Returns [(paper, score, snippet), ...] with matched terms in the snippet wrapped in `highlight`.
+    """
+    match_query = _fulltext_match_query(query)
+    if not match_query or not fulltext_index_available(db):
+        return []
+    try:
+        rows = db.execute(
+            text(f"SELECT rowid, bm25({FULLTEXT_TABLE}, {', '.join(map(str, FULLTEXT_COLUMN_WEIGHTS))}) AS rank, "
+                 f"snippet({FULLTEXT_TABLE}, -1, :start, :end, '...', 16) "
+                 f"FROM {FULLTEXT_TABLE} WHERE {FULLTEXT_TABLE} MATCH :query ORDER BY rank LIMIT :limit"),
+            {"query": match_query, "start": highlight[0], "end": highlight[1], "limit": limit}
+        ).all()
+    except OperationalError as e:
+        logger.warning(f"Full-text search failed for '{query}': {e}")
+        return []
+    papers = {paper.id: paper for paper in get_papers_by_ids(db, [row[0] for row in rows])}
+    # bm25() is lower for better matches; negate it so higher scores rank first
+    return [(papers[paper_id], -rank, snippet) for paper_id, rank, snippet in rows if paper_id in papers]
\ No newline at end of file
@@ -0,0 +1,91 @@
+# database/migrations.py
+# Lightweight, idempotent schema migrations applied by init_db after create_all.
+# create_all only creates missing tables, so changes to existing tables are listed here.
+
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex
+
+logger = logging.getLogger(__name__)
+
+# (table, column, SQL type) for nullable columns added after a table was first created
+ADDED_COLUMNS = [
+    ("summaries", "covered_paper_ids_json", "TEXT"),
+    ("papers", "normalized_title", "VARCHAR"),
+]
+
+# Indexes no longer declared on the models; dropped from existing databases
+DROPPED_INDEXES = [
+    "ix_papers_lower_title", # Replaced by the normalized_title column's index
+]
+
+def add_missing_columns(engine):
+    """Adds any column in ADDED_COLUMNS that an existing table does not have yet."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, sql_type in ADDED_COLUMNS:
+            existing_columns = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing_columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}"))
+                logger.info(f"Added column {table}.{column}")
+
+def create_missing_indexes(engine):
+    """
+    Creates any index declared on the models that an existing database does not have yet, and
+    drops those in DROPPED_INDEXES. create_all only creates indexes together with new tables.
+    IF (NOT) EXISTS is used because SQLite does not reflect expression indexes such as lower(name).
+    """
+    from database import Base
+    import database.models # Registers the tables on Base.metadata
+    with engine.begin() as conn:
+        for index_name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+    logger.info("Ensured all declared indexes exist.")
+
+def backfill_normalized_titles(engine):
+    """Fills papers.normalized_title for rows created before the column existed."""
+    from database.crud import normalize_title
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, title FROM papers WHERE normalized_title IS NULL AND title IS NOT NULL")).all()
+        if rows:
+            conn.execute(
+                text("UPDATE papers SET normalized_title = :normalized_title WHERE id = :id"),
+                [{"id": paper_id, "normalized_title": normalize_title(title)} for paper_id, title in rows]
+            )
+            logger.info(f"Backfilled normalized titles for {len(rows)} papers.")
+
+def create_fulltext_index(engine):
+    """
+    Creates the FTS5 table behind local full-text search (SQLite only) and fills it from the
+    existing papers the first time. Afterwards ingestion and summarization keep it up to date.
+    """
+    from config import settings
+    if not settings.FULLTEXT_INDEX_ENABLED or engine.dialect.name != "sqlite":
+        return
+    from database.crud import FULLTEXT_TABLE, FULLTEXT_COLUMNS, rebuild_fulltext_index
+    from database import SessionLocal
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FULLTEXT_TABLE}).first()
+            if exists:
+                return
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FULLTEXT_TABLE} USING fts5({', '.join(FULLTEXT_COLUMNS)}, tokenize = 'porter unicode61')"
+            ))
+    except OperationalError as e:
+        logger.warning(f"Full-text search is unavailable (SQLite built without FTS5?): {e}")
+        return
+    with SessionLocal() as db:
+        indexed_count = rebuild_fulltext_index(db)
+    logger.info(f"Created full-text index and indexed {indexed_count} existing papers.")
+
+def run_migrations(engine):
+    """Brings an existing database up to the current schema."""
+    add_missing_columns(engine)
+    backfill_normalized_titles(engine)
+    create_missing_indexes(engine)
+    create_fulltext_index(engine)
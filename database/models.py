@@ -1,9 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 
-from database import Base # Import Base from __init__.py
+from database import Base, engine, SessionLocal # Import Base from __init__.py; engine and SessionLocal are re-exported for agents
 
 class PaperStatus(enum.Enum):
     PENDING = "Pending"
@@ -22,13 +22,14 @@ class Paper(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
+    normalized_title = Column(String, index=True, nullable=True) # normalize_title(title), for duplicate detection
     abstract = Column(Text)
     authors = Column(String)
     publication_year = Column(Integer, nullable=True)
     doi = Column(String, unique=True, nullable=True) # Digital Object Identifier
     url = Column(String, nullable=True) # Direct URL to paper
     local_path = Column(String, nullable=True) # Path to locally stored PDF
-    status = Column(Enum(PaperStatus), default=PaperStatus.PENDING)
+    status = Column(Enum(PaperStatus), default=PaperStatus.PENDING, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -38,6 +39,11 @@ class Paper(Base):
     extracted_data = relationship("ExtractedData", back_populates="paper", uselist=False, cascade="all, delete-orphan")
     citations = relationship("Citation", back_populates="paper", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Case-insensitive DOI duplicate checks in create_papers_bulk (titles use normalized_title)
+        Index("ix_papers_lower_doi", func.lower(doi)),
+    )
+
 
 class Topic(Base):
     __tablename__ = "topics"
@@ -50,12 +56,20 @@ class Topic(Base):
     papers = relationship("Paper", secondary="paper_topics", back_populates="topics")
     summaries = relationship("Summary", back_populates="topic", cascade="all, delete-orphan") # For cross-paper summaries
 
+    __table_args__ = (
+        Index("ix_topics_lower_name", func.lower(name)), # get_topic_by_name matches case-insensitively
+    )
+
 class PaperTopic(Base):
     __tablename__ = "paper_topics"
 
     paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
     topic_id = Column(Integer, ForeignKey("topics.id"), primary_key=True)
 
+    __table_args__ = (
+        Index("ix_paper_topics_topic_id_paper_id", "topic_id", "paper_id"), # The primary key only serves lookups by paper_id
+    )
+
 
 class Summary(Base):
     __tablename__ = "summaries"
@@ -66,12 +80,18 @@ class Summary(Base):
     summary_type = Column(Enum(SummaryType), nullable=False)
     content = Column(Text, nullable=False)
     audio_path = Column(String, nullable=True)
+    covered_paper_ids_json = Column(Text, nullable=True) # JSON list of paper IDs folded into a cross-paper synthesis
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     paper = relationship("Paper", back_populates="summaries")
     topic = relationship("Topic", back_populates="summaries") # Links to the topic for synthesis summaries
 
+    __table_args__ = (
+        Index("ix_summaries_paper_id_summary_type", "paper_id", "summary_type"),
+        Index("ix_summaries_topic_id_summary_type", "topic_id", "summary_type"),
+    )
+
 
 class ExtractedData(Base):
     """Stores key extracted information from a paper, beyond just text."""
@@ -79,7 +99,7 @@ class ExtractedData(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     paper_id = Column(Integer, ForeignKey("papers.id"), unique=True)
-    full_text_path = Column(String, nullable=True) # Path to the cleaned, extracted text file
+    full_text_path = Column(String, nullable=True, index=True) # Path to the cleaned, extracted text file
     sections_json = Column(Text, nullable=True) # JSON representation of extracted sections (e.g., intro, methods, results)
     keywords_json = Column(Text, nullable=True) # JSON list of keywords
     figures_info_json = Column(Text, nullable=True) # JSON list of figure captions/details
@@ -93,7 +113,7 @@ class Citation(Base):
     __tablename__ = "citations"
 
     id = Column(Integer, primary_key=True, index=True)
-    paper_id = Column(Integer, ForeignKey("papers.id"))
+    paper_id = Column(Integer, ForeignKey("papers.id"), index=True)
     citation_text = Column(Text) # Full formatted citation (e.g., APA, MLA)
     bibtex_entry = Column(Text, nullable=True) # Optional: BibTeX format
     doi = Column(String, nullable=True) # Redundant but useful for quick lookup
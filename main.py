@@ -1,37 +1,48 @@
 import os
 import sys
+import time
 from celery import Celery
-from rich.console import Console
+from celery.result import GroupResult
+from rich.console import Console, Group
+from rich.live import Live
+from rich.text import Text
 from rich.prompt import Prompt
 from rich.progress import track
 from rich.panel import Panel
 from rich.table import Table
+from rich.markup import escape
 
 # Add project root to sys.path to allow absolute imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import settings
 from database.crud import (
-    get_paper_by_id, get_papers_by_topic, create_paper,
-    create_summary, update_paper_status, get_all_topics, create_topic,
-    get_topic_by_name
+    get_paper_by_id, get_papers_by_ids, create_paper, create_papers_bulk, search_papers_fulltext,
+    get_all_topics, create_topic, get_topic_by_name, get_topics_with_papers_and_summaries
 )
 from database.models import Base, engine, SessionLocal
 from database.models import PaperStatus, SummaryType # Import enums
+from database.migrations import run_migrations
+from utils.content_store import store_raw_file
+from utils.vector_index import find_related_papers
 
 # Import Celery tasks from agents
 # Note: In a real Celery setup, tasks are typically defined in the agent files
 # and imported here for registration with the Celery app.
-from agents.search_discovery_agent import search_papers_task
+from agents.search_discovery_agent import search_papers_task, search_papers_page_task
 from agents.ingestion_processing_agent import process_paper_task
 from agents.topic_classification_agent import classify_paper_task
 from agents.summary_generation_agent import generate_individual_summary_task
 from agents.cross_paper_synthesis_agent import generate_cross_paper_synthesis_task
 from agents.audio_generation_agent import generate_audio_task
+from agents.orchestration_agent import build_workflow, split_workflow_results, synthesize_topics_task
 
 # Initialize Rich Console for better CLI output
 console = Console()
 
+LIVE_PREVIEW_FILES = 3 # Streaming summaries shown at once while waiting on the workers
+LIVE_PREVIEW_CHARS = 600 # Tail of each summary shown
+
 # --- Celery App Initialization ---
 celery_app = Celery(
     'research_summarizer',
@@ -40,10 +51,12 @@ celery_app = Celery(
     include=[
         'agents.search_discovery_agent',
         'agents.ingestion_processing_agent',
+        'agents.info_extraction_agent',
         'agents.topic_classification_agent',
         'agents.summary_generation_agent',
         'agents.cross_paper_synthesis_agent',
-        'agents.audio_generation_agent'
+        'agents.audio_generation_agent',
+        'agents.orchestration_agent'
     ]
 )
 # Ensure Celery tasks are visible to the worker
@@ -52,6 +65,7 @@ celery_app = Celery(
 def init_db():
     """Initializes the database schema."""
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     console.print("[green]Database initialized![/green]")
 
 def display_paper_details(paper_id: int):
@@ -86,6 +100,15 @@ def display_paper_details(paper_id: int):
                 expand=False
             ))
 
+        # Nearest papers in the local embedding index
+        related = find_related_papers(paper.id, k=settings.RELATED_PAPERS_COUNT)
+        if related:
+            related_papers = {p.id: p for p in get_papers_by_ids(db, [p_id for p_id, _ in related])}
+            console.print("[bold]Related papers:[/bold]")
+            for related_id, similarity in related:
+                if related_id in related_papers:
+                    console.print(f"  [{related_id}] {escape(related_papers[related_id].title or '')} (similarity {similarity:.2f})")
+
 def handle_search_papers():
     """Handles the paper search and processing workflow."""
     keywords = Prompt.ask("[bold cyan]Enter topic keywords[/bold cyan] (e.g., 'large language models in healthcare')")
@@ -100,6 +123,22 @@ def handle_search_papers():
 
     console.print(f"[green]Searching for papers with keywords: '{keywords}' (Year: {year or 'Any'}, Limit: {limit})...[/green]")
 
+    if limit > settings.SEARCH_PAGE_SIZE:
+        # Large searches are paginated so each page's papers enter their pipelines while the next page is fetched.
+        # Topics are needed before the first page is dispatched
+        user_topics, synthesis_topics_list = ask_workflow_topics()
+        started_at = time.time()
+        workflows = search_and_ingest_pages(keywords, year, limit, user_topics)
+        if not workflows:
+            console.print("[yellow]No new papers to process.[/yellow]")
+            return
+        wait_for_workflows(workflows, started_at)
+        if synthesis_topics_list:
+            # Pages were dispatched separately, so synthesis over all of them runs once they are done
+            wait_for_workflows([([], synthesize_topics_task.delay([], synthesis_topics_list))], started_at)
+        console.print("[bold green]Workflow completed![/bold green]")
+        return
+
     # Dispatch search task
     search_result = search_papers_task.delay(keywords, year, limit)
     paper_data_list = search_result.get(timeout=60) # Wait for results, with timeout
@@ -110,42 +149,54 @@ def handle_search_papers():
 
     console.print(f"[green]Found {len(paper_data_list)} papers. Starting processing...[/green]")
 
-    processing_tasks = []
     with SessionLocal() as db:
-        for paper_data in track(paper_data_list, description="[bold blue]Queuing papers for processing...[/bold blue]"):
-            # Create paper entry in DB with PENDING status
-            paper = create_paper(db,
-                title=paper_data.get('title'),
-                abstract=paper_data.get('abstract'),
-                authors=paper_data.get('authors'),
-                publication_year=paper_data.get('publication_year'),
-                doi=paper_data.get('doi'),
-                url=paper_data.get('url'),
-                status=PaperStatus.PENDING # Initial status
-            )
-            # Dispatch processing task for each paper
-            processing_tasks.append(process_paper_task.delay(paper.id))
-
-    console.print(f"[green]Processing {len(processing_tasks)} papers asynchronously...[/green]")
-    # You'd typically poll for status or wait for callbacks in a real UI
-    # For CLI, we can block, or show a progress bar for result retrieval
-    processed_paper_ids = []
-    for i, task in enumerate(track(processing_tasks, description="[bold blue]Waiting for papers to be processed...[/bold blue]")):
+        # Create all new paper entries in one transaction with PENDING status; known papers are not re-queued
+        paper_results = create_papers_bulk(db, paper_data_list, status=PaperStatus.PENDING)
+    new_paper_ids = [paper_id for paper_id, created in paper_results if created]
+    known_count = len(paper_results) - len(new_paper_ids)
+    if known_count:
+        console.print(f"[yellow]{known_count} papers are already in the database or duplicated in the results. Skipping them.[/yellow]")
+
+    if not new_paper_ids:
+        console.print("[yellow]No new papers to process.[/yellow]")
+        return
+
+    # Each paper is processed, classified and summarized in its own pipeline
+    classify_and_summarize_papers(new_paper_ids, process_first=True)
+
+
+def search_and_ingest_pages(keywords: str, year: str, limit: int, topic_list: list[str]) -> list:
+    """
+    Fetches search results page by page via their cursor and dispatches each new paper's pipeline
+    (process -> classify -> summarize -> audio) as soon as its page arrives, so downloading, parsing
+    and summarizing overlap with discovery. Returns [(paper_ids, workflow_result), ...] per page
+    for wait_for_workflows.
+    """
+    workflows = []
+    cursor = None
+    found = 0
+    page_number = 0
+    while found < limit:
+        page_number += 1
         try:
-            result = task.get(timeout=300) # Wait up to 5 minutes per paper for processing
-            if result: # Result should be paper_id if successful
-                processed_paper_ids.append(result)
-                console.print(f"[green]Paper ID {result} processed successfully.[/green]")
+            page = search_papers_page_task.delay(keywords, year, settings.SEARCH_PAGE_SIZE, cursor).get(timeout=60)
         except Exception as e:
-            console.print(f"[red]Error processing paper {i+1}: {e}[/red]")
-            continue
-
-    if not processed_paper_ids:
-        console.print("[yellow]No papers were successfully processed.[/yellow]")
-        return
+            console.print(f"[red]Search failed on page {page_number}: {e}[/red]")
+            break
+        papers = page["papers"][:limit - found]
+        found += len(papers)
 
-    console.print(f"[green]Successfully processed {len(processed_paper_ids)} papers. Now classifying and summarizing...[/green]")
-    classify_and_summarize_papers(processed_paper_ids)
+        with SessionLocal() as db:
+            paper_results = create_papers_bulk(db, papers, status=PaperStatus.PENDING)
+        page_paper_ids = [paper_id for paper_id, created in paper_results if created]
+        if page_paper_ids:
+            workflows.append((page_paper_ids, build_workflow(page_paper_ids, topic_list, [], process=True).apply_async()))
+        console.print(f"[green]Page {page_number}: {len(papers)} papers found, {len(page_paper_ids)} new queued for processing.[/green]")
+
+        cursor = page["next_cursor"]
+        if not cursor or not papers:
+            break
+    return workflows
 
 
 def handle_upload_pdf():
@@ -158,12 +209,10 @@ def handle_upload_pdf():
         console.print("[red]Only PDF files are supported.[/red]")
         return
 
-    # Simulate saving to raw_papers directory
+    # Save to raw_papers directory under the content hash; identical uploads reuse the stored copy
     file_name = os.path.basename(file_path)
-    destination_path = os.path.join(settings.RAW_PAPERS_DIR, file_name)
-    import shutil
-    shutil.copy(file_path, destination_path)
-    console.print(f"[green]PDF copied to {destination_path}[/green]")
+    _, destination_path = store_raw_file(file_path, settings.RAW_PAPERS_DIR)
+    console.print(f"[green]PDF stored at {destination_path}[/green]")
 
     with SessionLocal() as db:
         # Create a new paper entry in the database
@@ -222,12 +271,40 @@ def handle_process_url_doi():
             console.print(f"[red]Error processing URL/DOI: {e}[/red]")
 
 
-def classify_and_summarize_papers(paper_ids: list[int]):
-    """Orchestrates classification, individual summary, and synthesis for given paper IDs."""
-    if not paper_ids:
-        console.print("[yellow]No papers to classify or summarize.[/yellow]")
-        return
-
+def _render_streamed_summaries(since: float, done: int, total: int):
+    """Renders the tail of the summary files most recently written since the given time."""
+    try:
+        files = [entry for entry in os.scandir(settings.SUMMARIES_DIR) if entry.name.endswith(".txt") and entry.stat().st_mtime >= since]
+    except OSError:
+        files = []
+    files = sorted(files, key=lambda entry: entry.stat().st_mtime, reverse=True)[:LIVE_PREVIEW_FILES]
+    panels = []
+    for entry in files:
+        try:
+            with open(entry.path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+        except OSError:
+            continue # Removed after a failed generation
+        tail = content if len(content) <= LIVE_PREVIEW_CHARS else "..." + content[-LIVE_PREVIEW_CHARS:]
+        panels.append(Panel(Text(tail), title=entry.name, title_align="left"))
+    return Group(Text(f"{done} of {total} tasks finished", style="bold blue"), *panels)
+
+def follow_streamed_summaries(results: list, since: float, timeout: int = 600):
+    """
+    Shows summaries and syntheses as the workers stream them into SUMMARIES_DIR, until all
+    results are ready or the timeout passes. Results are not fetched here; callers .get() them after.
+    """
+    deadline = time.monotonic() + timeout
+    with Live(_render_streamed_summaries(since, 0, len(results)), console=console, refresh_per_second=4, transient=True) as live:
+        while time.monotonic() < deadline:
+            done = sum(1 for result in results if result.ready())
+            live.update(_render_streamed_summaries(since, done, len(results)))
+            if done == len(results):
+                break
+            time.sleep(0.25)
+
+def ask_workflow_topics() -> tuple[list[str], list[str]]:
+    """Asks for classification and synthesis topics, creating new classification topics. Returns (topics, synthesis_topics)."""
     # 1. Get user topics
     console.print("\n[bold magenta]--- Topic Classification ---[/bold magenta]")
     existing_topics = get_all_topics(SessionLocal())
@@ -249,107 +326,78 @@ def classify_and_summarize_papers(paper_ids: list[int]):
         # If user provides no new topics but existing ones exist, use existing
         user_topics = [t.name for t in existing_topics]
 
-
-    # 2. Dispatch classification and individual summary tasks
-    classification_tasks = []
-    summary_tasks = []
-    for paper_id in track(paper_ids, description="[bold blue]Queuing for classification and individual summary...[/bold blue]"):
-        if user_topics:
-            classification_tasks.append(classify_paper_task.delay(paper_id, user_topics))
-        summary_tasks.append(generate_individual_summary_task.delay(paper_id))
-
-    console.print("[green]Waiting for classification results...[/green]")
-    classified_results = []
-    for i, task in enumerate(track(classification_tasks, description="[bold blue]Retrieving classification results...[/bold blue]")):
-        try:
-            result = task.get(timeout=60)
-            if result:
-                classified_results.append(result)
-        except Exception as e:
-            console.print(f"[red]Error during classification for a paper: {e}[/red]")
-
-    console.print("[green]Waiting for individual summary results...[/green]")
-    summarized_paper_ids = []
-    for i, task in enumerate(track(summary_tasks, description="[bold blue]Retrieving individual summaries...[/bold blue]")):
-        try:
-            summary_id = task.get(timeout=120)
-            if summary_id:
-                summarized_paper_ids.append(summary_id)
-                console.print(f"[green]Summary generated for paper ID {summary_id}.[/green]")
-        except Exception as e:
-            console.print(f"[red]Error during individual summarization for a paper: {e}[/red]")
-
-    # 3. Trigger audio generation for individual summaries
-    audio_tasks = []
-    with SessionLocal() as db:
-        for paper_id in summarized_paper_ids:
-            # Retrieve the created summary to get its content
-            paper = get_paper_by_id(db, paper_id)
-            if paper and paper.summaries:
-                individual_summary = next((s for s in paper.summaries if s.summary_type == SummaryType.INDIVIDUAL_PAPER), None)
-                if individual_summary:
-                    audio_tasks.append(generate_audio_task.delay(individual_summary.id, individual_summary.content))
-
-    console.print("[green]Waiting for audio generation for individual summaries...[/green]")
-    for i, task in enumerate(track(audio_tasks, description="[bold blue]Retrieving audio results...[/bold blue]")):
-        try:
-            task.get(timeout=60)
-        except Exception as e:
-            console.print(f"[red]Error during audio generation for a summary: {e}[/red]")
-
-
-    # 4. Cross-paper synthesis
+    # 2. Cross-paper synthesis topics are chosen up front so synthesis can run as soon as the papers are done
     console.print("\n[bold magenta]--- Cross-Paper Synthesis ---[/bold magenta]")
-    synthesis_topics = Prompt.ask("[bold cyan]Enter topics for cross-paper synthesis (comma-separated, from classified topics)[/bold cyan] or leave blank to skip")
+    synthesis_topics = Prompt.ask("[bold cyan]Enter topics for cross-paper synthesis (comma-separated, from classification topics)[/bold cyan] or leave blank to skip")
     synthesis_topics_list = [t.strip() for t in synthesis_topics.split(',') if t.strip()]
-
     if not synthesis_topics_list:
         console.print("[yellow]No synthesis topics provided. Skipping cross-paper synthesis.[/yellow]")
-        return
-
-    synthesis_tasks = []
-    with SessionLocal() as db:
-        for topic_name in synthesis_topics_list:
-            topic = get_topic_by_name(db, topic_name)
-            if topic:
-                # Get all papers associated with this topic that have been processed
-                papers_in_topic = get_papers_by_topic(db, topic.id)
-                relevant_paper_ids = [p.id for p in papers_in_topic if p.status == PaperStatus.PROCESSED]
-                if relevant_paper_ids:
-                    console.print(f"[green]Queuing synthesis for topic '{topic_name}' with {len(relevant_paper_ids)} papers.[/green]")
-                    synthesis_tasks.append(generate_cross_paper_synthesis_task.delay(topic.id, relevant_paper_ids))
-                else:
-                    console.print(f"[yellow]No processed papers found for topic '{topic_name}'. Skipping synthesis.[/yellow]")
-            else:
-                console.print(f"[red]Topic '{topic_name}' not found in database. Skipping synthesis.[/red]")
-
-    console.print("[green]Waiting for cross-paper synthesis results...[/green]")
-    synthesized_summary_ids = []
-    for i, task in enumerate(track(synthesis_tasks, description="[bold blue]Retrieving synthesis results...[/bold blue]")):
+    return user_topics, synthesis_topics_list
+
+def wait_for_workflows(workflows: list, started_at: float):
+    """
+    Waits for workflows from build_workflow, given as [(paper_ids, workflow_result), ...], showing
+    summaries as they stream in, then reports the paper pipelines, batch classification and synthesis.
+    """
+    paper_ids, paper_results, classification_results, synthesis_results = [], [], [], []
+    for workflow_paper_ids, workflow_result in workflows:
+        workflow_paper_results, workflow_classification_results = split_workflow_results(workflow_result, len(workflow_paper_ids))
+        paper_ids.extend(workflow_paper_ids)
+        paper_results.extend(workflow_paper_results)
+        classification_results.extend(workflow_classification_results)
+        if not isinstance(workflow_result, GroupResult):
+            synthesis_results.append(workflow_result) # Chord callback
+
+    if paper_results:
+        console.print(f"[green]Running {len(paper_results)} paper pipelines asynchronously...[/green]")
+        # Papers finish independently; summaries are shown as they stream in, then the results are collected
+        follow_streamed_summaries(paper_results + classification_results, started_at)
+    completed = 0
+    for i, task in enumerate(track(paper_results, description="[bold blue]Waiting for paper pipelines...[/bold blue]")):
         try:
-            summary_id = task.get(timeout=300)
-            if summary_id:
-                synthesized_summary_ids.append(summary_id)
-                console.print(f"[green]Synthesis generated for topic {summary_id}.[/green]")
+            task.get(timeout=600) # Whole chain: processing, classification, summary and audio
+            completed += 1
         except Exception as e:
-            console.print(f"[red]Error during cross-paper synthesis: {e}[/red]")
-
-    # 5. Trigger audio generation for synthesized summaries
-    audio_tasks_synthesis = []
-    with SessionLocal() as db:
-        for summary_id in synthesized_summary_ids:
-            # Need a way to get summary by ID and its content
-            from database.crud import get_summary_by_id # Import here to avoid circular
-            summary = get_summary_by_id(db, summary_id)
-            if summary:
-                audio_tasks_synthesis.append(generate_audio_task.delay(summary.id, summary.content))
-
-    console.print("[green]Waiting for audio generation for synthesized summaries...[/green]")
-    for i, task in enumerate(track(audio_tasks_synthesis, description="[bold blue]Retrieving synthesis audio results...[/bold blue]")):
+            console.print(f"[red]Error in pipeline for paper {paper_ids[i]}: {e}[/red]")
+    if paper_results:
+        console.print(f"[green]{completed} of {len(paper_results)} paper pipelines completed.[/green]")
+
+    # Batched classification ran alongside the paper pipelines
+    if classification_results:
+        classified_count = 0
+        for result in classification_results:
+            try:
+                classified_count += len(result.get(timeout=600) or [])
+            except Exception as e:
+                console.print(f"[red]Error during batch classification: {e}[/red]")
+        console.print(f"[green]{classified_count} papers classified in batches.[/green]")
+
+    # Cross-paper synthesis and its audio
+    for result in synthesis_results:
+        console.print("[green]Waiting for cross-paper synthesis results...[/green]")
+        follow_streamed_summaries([result], started_at)
         try:
-            task.get(timeout=60)
+            console.print(f"[green]Synthesis generated for {len(result.get(timeout=600) or [])} topics.[/green]")
         except Exception as e:
-            console.print(f"[red]Error during audio generation for synthesis: {e}[/red]")
+            console.print(f"[red]Error during cross-paper synthesis: {e}[/red]")
+
+def classify_and_summarize_papers(paper_ids: list[int], process_first: bool = False):
+    """
+    Orchestrates classification, individual summary, audio and synthesis for given paper IDs.
+    Each paper runs through its own Celery chain (process -> classify -> summarize -> audio),
+    batched classification runs alongside the chains, and cross-paper synthesis fires as a chord
+    callback once all of them have finished.
+    """
+    if not paper_ids:
+        console.print("[yellow]No papers to classify or summarize.[/yellow]")
+        return
+
+    user_topics, synthesis_topics_list = ask_workflow_topics()
+
+    # 3. Dispatch one pipeline per paper; batched classification runs next to them and synthesis (if any) is the chord callback
+    started_at = time.time()
+    workflow_result = build_workflow(paper_ids, user_topics, synthesis_topics_list, process=process_first).apply_async()
+    wait_for_workflows([(paper_ids, workflow_result)], started_at)
 
     console.print("[bold green]Workflow completed![/bold green]")
 
@@ -357,30 +405,62 @@ def classify_and_summarize_papers(paper_ids: list[int]):
 def view_existing_summaries():
     """Displays existing summaries organized by topic."""
     console.print("\n[bold magenta]--- Existing Summaries ---[/bold magenta]")
-    topics = get_all_topics(SessionLocal())
-    if not topics:
-        console.print("[yellow]No topics found yet.[/yellow]")
+    with SessionLocal() as db:
+        # Topics, their papers and all summaries are loaded up front in a constant number of queries
+        topics = get_topics_with_papers_and_summaries(db)
+        if not topics:
+            console.print("[yellow]No topics found yet.[/yellow]")
+            return
+
+        for topic in topics:
+            _print_topic_summaries(topic)
+
+
+def _print_topic_summaries(topic):
+    """Prints the papers, individual summaries and syntheses of one eagerly loaded topic."""
+    console.print(Panel(f"[bold blue]Topic: {topic.name}[/bold blue]", expand=False))
+    if not topic.papers:
+        console.print("[yellow]No papers for this topic yet.[/yellow]")
         return
 
-    for topic in topics:
-        console.print(Panel(f"[bold blue]Topic: {topic.name}[/bold blue]", expand=False))
-        papers_in_topic = get_papers_by_topic(SessionLocal(), topic.id)
-        if not papers_in_topic:
-            console.print("[yellow]No papers for this topic yet.[/yellow]")
-            continue
-
-        for paper in papers_in_topic:
-            console.print(f"  [bold]Paper:[/bold] {paper.title} ({paper.publication_year})")
-            for summary in paper.summaries:
-                if summary.summary_type == SummaryType.INDIVIDUAL_PAPER:
-                    console.print(f"    [bold green]  Individual Summary:[/bold green] {summary.content[:150]}...")
-                    console.print(f"      [bold]Audio:[/bold] {summary.audio_path or 'N/A'}")
-            # Display cross-paper synthesis for the topic
-        for summary in topic.summaries:
-            if summary.summary_type == SummaryType.CROSS_PAPER_SYNTHESIS:
-                console.print(f"  [bold yellow]Cross-Paper Synthesis:[/bold yellow] {summary.content[:200]}...")
-                console.print(f"    [bold]Audio:[/bold] {summary.audio_path or 'N/A'}")
-        console.print("") # New line for separation
+    for paper in topic.papers:
+        console.print(f"  [bold]Paper:[/bold] {paper.title} ({paper.publication_year})")
+        for summary in paper.summaries:
+            if summary.summary_type == SummaryType.INDIVIDUAL_PAPER:
+                console.print(f"    [bold green]  Individual Summary:[/bold green] {summary.content[:150]}...")
+                console.print(f"      [bold]Audio:[/bold] {summary.audio_path or 'N/A'}")
+    # Display cross-paper synthesis for the topic
+    for summary in topic.summaries:
+        if summary.summary_type == SummaryType.CROSS_PAPER_SYNTHESIS:
+            console.print(f"  [bold yellow]Cross-Paper Synthesis:[/bold yellow] {summary.content[:200]}...")
+            console.print(f"    [bold]Audio:[/bold] {summary.audio_path or 'N/A'}")
+    console.print("") # New line for separation
+
+
+def handle_search_library():
+    """Searches titles, abstracts, full texts and summaries of papers already in the local database."""
+    query = Prompt.ask("[bold cyan]Enter search terms[/bold cyan] (append * for prefix matches, e.g. 'summar*')")
+    with SessionLocal() as db:
+        # Control characters mark the matched terms so they survive escaping of the snippet
+        results = search_papers_fulltext(db, query, limit=settings.FULLTEXT_SEARCH_LIMIT, highlight=("\x02", "\x03"))
+        if not results:
+            console.print("[yellow]No matching papers in the local library.[/yellow]")
+            return
+
+        table = Table(title=f"Local library results for '{escape(query)}'")
+        table.add_column("ID", justify="right")
+        table.add_column("Title")
+        table.add_column("Year")
+        table.add_column("Score", justify="right")
+        table.add_column("Match")
+        for paper, score, snippet in results:
+            snippet = escape(snippet).replace("\x02", "[bold yellow]").replace("\x03", "[/bold yellow]")
+            table.add_row(str(paper.id), escape(paper.title or ""), str(paper.publication_year or ""), f"{score:.2f}", snippet)
+        console.print(table)
+
+    paper_id = Prompt.ask("[bold cyan]Enter a paper ID to view its details[/bold cyan] or leave blank to return", default="")
+    if paper_id.isdigit():
+        display_paper_details(int(paper_id))
 
 
 def main_menu():
@@ -394,13 +474,14 @@ def main_menu():
             "2. [b]Upload[/b] a PDF file\n"
             "3. [b]Process[/b] from URL or DOI\n"
             "4. [b]View[/b] existing summaries and podcasts\n"
-            "5. [b]Exit[/b]\n",
+            "5. [b]Search[/b] the local library\n"
+            "6. [b]Exit[/b]\n",
             title="Main Menu",
             title_align="left",
             expand=False
         ))
 
-        choice = Prompt.ask("[bold]Enter your choice[/bold] (1-5)", choices=["1", "2", "3", "4", "5"])
+        choice = Prompt.ask("[bold]Enter your choice[/bold] (1-6)", choices=["1", "2", "3", "4", "5", "6"])
 
         if choice == "1":
             handle_search_papers()
@@ -411,6 +492,8 @@ def main_menu():
         elif choice == "4":
             view_existing_summaries()
         elif choice == "5":
+            handle_search_library()
+        elif choice == "6":
             console.print("[bold red]Exiting. Goodbye![/bold red]")
             break
 
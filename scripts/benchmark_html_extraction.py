@@ -0,0 +1,75 @@
+# scripts/benchmark_html_extraction.py
+# Times each HTML-to-text backend over saved HTML pages and checks that its output matches
+# the BeautifulSoup baseline. Backends whose optional package is missing are skipped.
+#
+# Usage: python scripts/benchmark_html_extraction.py [--fixtures DIR] [--scale 20] [--repeat 10]
+# --scale repeats each page's <body> content to emulate large publisher landing pages.
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.web_scraper import HTML_EXTRACTION_BACKENDS
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+
+def load_fixtures(directory: str, scale: int) -> dict:
+    """Returns {file name: html}, with the body content repeated `scale` times."""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        if scale > 1:
+            match = re.search(r"(<body[^>]*>)(.*)(</body>)", html, re.DOTALL | re.IGNORECASE)
+            if match:
+                html = html[:match.start(2)] + match.group(2) * scale + html[match.end(2):]
+        pages[os.path.basename(path)] = html
+    return pages
+
+def measure(extract, html: str, repeat: int):
+    """Returns (milliseconds per call, peak Python-heap memory in MB, output). C-level parser memory is not traced."""
+    output = extract(html) # Warm-up, and the output to compare
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract(html)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    tracemalloc.start()
+    extract(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024**2, output
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures, args.scale)
+    if not pages:
+        print(f"No .html fixtures found in {args.fixtures}")
+        return
+
+    for name, html in pages.items():
+        print(f"\n{name} ({len(html) / 1024:.0f} KB)")
+        baseline = None
+        for backend in ("beautifulsoup", "selectolax", "lxml", "stream"):
+            try:
+                elapsed_ms, peak_mb, output = measure(HTML_EXTRACTION_BACKENDS[backend], html, args.repeat)
+            except ImportError as e:
+                print(f"  {backend:<14} skipped ({e})")
+                continue
+            if baseline is None:
+                baseline = (elapsed_ms, output)
+            matches = "same text" if output == baseline[1] else "DIFFERENT text"
+            print(f"  {backend:<14} {elapsed_ms:8.2f} ms  {baseline[0] / elapsed_ms:6.1f}x  py-heap peak {peak_mb:7.2f} MB  {matches}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
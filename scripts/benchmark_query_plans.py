@@ -0,0 +1,123 @@
+# scripts/benchmark_query_plans.py
+# Builds a synthetic SQLite database (100k papers by default), then times the hot crud
+# lookups and prints their query plans before and after the migration indexes are created.
+#
+# Usage: python scripts/benchmark_query_plans.py [--papers 100000] [--topics 50] [--repeat 20]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_db_engine
+from database import crud
+from database.migrations import create_missing_indexes
+from database.models import Paper, Topic, PaperTopic, Summary, Citation, PaperStatus, SummaryType
+
+def populate(engine, num_papers: int, num_topics: int):
+    """Inserts papers, topics, topic links, summaries and citations in bulk."""
+    rng = random.Random(42)
+    statuses = list(PaperStatus)
+    with engine.begin() as conn:
+        conn.execute(insert(Topic), [{"id": t, "name": f"Topic {t}"} for t in range(1, num_topics + 1)])
+        conn.execute(insert(Paper), [{
+            "id": p, "title": f"Paper {p}", "abstract": "Synthetic abstract.", "authors": "Doe, J",
+            "doi": f"10.1000/{p}", "status": rng.choice(statuses)
+        } for p in range(1, num_papers + 1)])
+        conn.execute(insert(PaperTopic), [
+            {"paper_id": p, "topic_id": t}
+            for p in range(1, num_papers + 1)
+            for t in rng.sample(range(1, num_topics + 1), 2)
+        ])
+        conn.execute(insert(Summary), [{
+            "paper_id": p, "summary_type": SummaryType.INDIVIDUAL_PAPER, "content": f"Summary of paper {p}."
+        } for p in range(1, num_papers + 1)])
+        conn.execute(insert(Summary), [{
+            "topic_id": t, "summary_type": SummaryType.CROSS_PAPER_SYNTHESIS, "content": f"Synthesis {i} of topic {t}."
+        } for t in range(1, num_topics + 1) for i in range(10)])
+        conn.execute(insert(Citation), [{
+            "paper_id": p, "citation_text": f"Doe, J. Paper {p}.", "title": f"Paper {p}"
+        } for p in range(1, num_papers + 1)])
+
+def drop_declared_indexes(engine):
+    """Drops the explicitly declared indexes so the baseline matches a pre-migration database."""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if not index.unique:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+def hot_queries(num_papers: int, num_topics: int):
+    """Returns (name, callable(db)) pairs exercising the crud lookups the indexes target."""
+    sample_ids = list(range(1, num_papers + 1, max(1, num_papers // 200)))
+    return [
+        ("get_topic_by_name", lambda db: crud.get_topic_by_name(db, f"topic {num_topics // 2}")),
+        ("get_papers_by_topic", lambda db: crud.get_papers_by_topic(db, num_topics // 2)),
+        ("get_individual_summaries_for_papers", lambda db: crud.get_individual_summaries_for_papers(db, sample_ids)),
+        ("get_latest_topic_synthesis", lambda db: crud.get_latest_topic_synthesis(db, num_topics // 2)),
+        ("get_citations_for_papers", lambda db: crud.get_citations_for_papers(db, sample_ids)),
+        ("papers by status", lambda db: db.query(Paper.id).filter(Paper.status == PaperStatus.FAILED).all()),
+    ]
+
+def measure(engine, queries, repeat: int) -> dict:
+    """Returns {name: (milliseconds per call, query plan lines)} for each query."""
+    Session = sessionmaker(bind=engine)
+    executed = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", capture)
+    results = {}
+    try:
+        for name, run in queries:
+            with Session() as db:
+                executed.clear()
+                run(db)
+                statement, parameters = executed[-1]
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    run(db)
+                    db.expunge_all()
+                elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+            with engine.connect() as conn:
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            results[name] = (elapsed_ms, [row[-1] for row in plan])
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=100000)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+        Base.metadata.create_all(bind=engine)
+        drop_declared_indexes(engine)
+        print(f"Populating {args.papers} papers across {args.topics} topics...")
+        populate(engine, args.papers, args.topics)
+
+        queries = hot_queries(args.papers, args.topics)
+        before = measure(engine, queries, args.repeat)
+        create_missing_indexes(engine)
+        after = measure(engine, queries, args.repeat)
+        engine.dispose()
+
+    for name, _ in queries:
+        before_ms, before_plan = before[name]
+        after_ms, after_plan = after[name]
+        print(f"\n{name}: {before_ms:.2f} ms -> {after_ms:.2f} ms")
+        print("  before: " + " | ".join(before_plan))
+        print("  after:  " + " | ".join(after_plan))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
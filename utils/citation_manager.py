@@ -50,9 +50,10 @@ def format_citation(paper_details: Dict[str, str], style: str = "APA") -> str:
         logger.warning(f"Unsupported citation style: {style}. Returning a default format.")
         return f"{authors} ({year}). {title}. {journal}. DOI: {doi if doi else url}"
 
-def extract_and_store_citation(db_session, paper_id: int, paper_data: dict) -> Optional[int]:
+def extract_and_store_citation(db_session, paper_id: int, paper_data: dict, commit: bool = True) -> Optional[int]:
     """
     Extracts citation details from paper_data and stores it in the database.
+    With commit=False the citation is only flushed, for callers inside a unit of work.
     Returns the citation ID if successful.
     """
     citation_text = format_citation(paper_data, style="APA") # You can choose your default style
@@ -66,8 +67,9 @@ def extract_and_store_citation(db_session, paper_id: int, paper_data: dict) -> O
             doi=paper_data.get('doi'),
             authors=paper_data.get('authors'),
             title=paper_data.get('title'),
-            year=paper_data.get('publication_year')
+            year=paper_data.get('publication_year'),
             # Add other fields as needed
+            commit=commit
         )
         logger.info(f"Citation created for paper ID {paper_id}")
         return citation.id
@@ -80,11 +82,10 @@ def get_citations_for_summary(db_session, paper_ids: List[int]) -> str:
     Retrieves and formats citations for a given list of paper IDs.
     Useful for cross-paper synthesis.
     """
-    from database.crud import get_paper_by_id # Import here
+    from database.crud import get_citations_for_papers # Import here
     citations_list = []
-    for p_id in paper_ids:
-        paper = get_paper_by_id(db_session, p_id)
-        if paper and paper.citations:
-            # Assuming one citation per paper for simplicity
-            citations_list.append(paper.citations[0].citation_text)
+    # One query per batch of IDs instead of loading each paper and its citations lazily
+    for paper_citations in get_citations_for_papers(db_session, paper_ids).values():
+        # Assuming one citation per paper for simplicity
+        citations_list.append(paper_citations[0].citation_text)
     return "\n".join(sorted(list(set(citations_list)))) # Sort and remove duplicates
\ No newline at end of file
@@ -0,0 +1,180 @@
+# utils/content_store.py
+# Content-addressed storage for raw papers and their extracted text.
+# Files are named by the SHA-256 of their source bytes, so identical uploads or
+# re-fetched pages map to the same entry and can skip copying and parsing.
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import Iterable, Optional, Set, Tuple
+
+from config import settings
+from utils.file_utils import save_text_chunks_to_file
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024 # Read files in 1 MiB blocks when hashing
+TEMP_SUFFIX = ".tmp" # Files still being written; never served or evicted
+
+def compute_file_hash(file_path: str) -> str:
+    """Returns the SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def compute_content_hash(content) -> str:
+    """Returns the SHA-256 hex digest of in-memory content (str or bytes)."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+def _text_path(content_hash: str) -> str:
+    return os.path.join(settings.CONTENT_STORE_DIR, f"{content_hash}.txt")
+
+def _metadata_path(content_hash: str) -> str:
+    return os.path.join(settings.CONTENT_STORE_DIR, f"{content_hash}.json")
+
+def _touch(path: str):
+    """Marks a file as recently used for LRU eviction."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def get_cached_text(content_hash: str) -> Tuple[Optional[str], dict]:
+    """
+    Looks up extracted text for a content hash.
+    Returns (text_file_path, metadata), or (None, {}) on a cache miss.
+    """
+    text_path = _text_path(content_hash)
+    if not os.path.exists(text_path):
+        return None, {}
+
+    metadata = {}
+    metadata_path = _metadata_path(content_hash)
+    if os.path.exists(metadata_path):
+        try:
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            _touch(metadata_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached metadata {metadata_path}: {e}")
+    _touch(text_path)
+    logger.info(f"Content store hit for {content_hash[:12]}")
+    return text_path, metadata
+
+def store_text(content_hash: str, text_chunks: Iterable[str], metadata: Optional[dict] = None) -> Optional[str]:
+    """
+    Streams extracted text into the store under its content hash, along with any metadata.
+    The text is written to a temporary file and renamed into place, so get_cached_text never
+    sees a partially written file (from a concurrent writer or a crashed one).
+    Returns the text file path, or None if nothing could be written.
+    """
+    text_path = _text_path(content_hash)
+    temp_name = f"{os.path.basename(text_path)}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+    temp_path = save_text_chunks_to_file(text_chunks, settings.CONTENT_STORE_DIR, temp_name)
+    if not temp_path:
+        return None
+    if metadata:
+        # Stored before the text appears, so a cache hit always has its metadata
+        metadata_temp_path = f"{_metadata_path(content_hash)}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+        try:
+            with open(metadata_temp_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+            os.replace(metadata_temp_path, _metadata_path(content_hash))
+        except (OSError, TypeError) as e:
+            logger.warning(f"Failed to store metadata for {content_hash[:12]}: {e}")
+            if os.path.exists(metadata_temp_path):
+                os.remove(metadata_temp_path)
+    try:
+        os.replace(temp_path, text_path)
+    except OSError as e:
+        logger.error(f"Failed to move {temp_path} into the content store: {e}")
+        os.remove(temp_path)
+        return None
+    evict_to_size(settings.CONTENT_STORE_DIR, settings.PROCESSED_TEXTS_MAX_BYTES, keep=text_path)
+    return text_path
+
+def store_raw_file(source_path: str, directory: str = None) -> Tuple[str, str]:
+    """
+    Copies a raw paper into `directory` under its content hash, skipping the copy if the
+    same bytes are already stored. Returns (content_hash, stored_path).
+    """
+    directory = directory or settings.RAW_PAPERS_DIR
+    content_hash = compute_file_hash(source_path)
+    extension = os.path.splitext(source_path)[1].lower()
+    stored_path = os.path.join(directory, f"{content_hash}{extension}")
+    if os.path.exists(stored_path):
+        _touch(stored_path)
+        logger.info(f"{source_path} already stored as {stored_path}")
+    else:
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{stored_path}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+        shutil.copy(source_path, temp_path)
+        os.replace(temp_path, stored_path)
+        evict_to_size(directory, settings.RAW_PAPERS_MAX_BYTES, keep=stored_path)
+    return content_hash, stored_path
+
+def _referenced_paths(paths: Iterable[str]) -> Set[str]:
+    """
+    Returns the absolute paths (without extension) of the given files that papers or their
+    extracted data still point to. Files sharing a referenced stem (e.g. the metadata next to
+    a text file) count as referenced too.
+    """
+    from database.models import SessionLocal # Imported here to avoid a circular dependency with the agents
+    from database.crud import get_referenced_file_paths
+    candidates = set()
+    for path in paths:
+        text_path = os.path.splitext(path)[0] + ".txt" # Metadata files belong to the text file of the same hash
+        candidates.update({path, os.path.abspath(path), text_path, os.path.abspath(text_path)})
+    with SessionLocal() as db:
+        referenced = get_referenced_file_paths(db, list(candidates))
+    return {os.path.splitext(os.path.abspath(path))[0] for path in referenced}
+
+def evict_to_size(directory: str, max_bytes: int, keep: Optional[str] = None) -> int:
+    """
+    Deletes least recently used files from `directory` until its total size is within max_bytes.
+    Files a paper or its extracted data still points to (Paper.local_path, ExtractedData.full_text_path)
+    are never evicted, nor are files still being written. A max_bytes of 0 disables eviction.
+    Returns the number of bytes freed.
+    """
+    if max_bytes <= 0 or not os.path.isdir(directory):
+        return 0
+
+    entries = []
+    total_size = 0
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+    if total_size <= max_bytes:
+        return 0
+
+    try:
+        referenced = _referenced_paths(path for _, _, path in entries if not path.endswith(TEMP_SUFFIX))
+    except Exception as e:
+        logger.warning(f"Skipping eviction in {directory}: could not check which files are still referenced: {e}")
+        return 0
+
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total_size - freed <= max_bytes:
+            break
+        if keep and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        if path.endswith(TEMP_SUFFIX) or os.path.splitext(os.path.abspath(path))[0] in referenced:
+            continue
+        try:
+            os.remove(path)
+            freed += size
+        except OSError as e:
+            logger.warning(f"Failed to evict {path}: {e}")
+    if freed:
+        logger.info(f"Evicted {freed} bytes from {directory}")
+    return freed
@@ -0,0 +1,85 @@
+# utils/doi_cache.py
+# Persistent DOI -> URL cache, so re-runs and task retries don't resolve the same DOI again.
+# DOIs that could not be resolved are cached too (as NULL), with a shorter TTL.
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MAX_VARIABLES = 900 # Stay below SQLite's bound parameter limit in IN (...) lookups
+
+def normalize_doi(doi: str) -> str:
+    """Lowercases a DOI and strips resolver prefixes, since DOIs are case-insensitive."""
+    doi = (doi or "").strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):]
+    return doi
+
+
+class DOIResolutionCache:
+    """SQLite-backed cache shared by all worker processes."""
+    def __init__(self, path: str = None, ttl_seconds: int = None, negative_ttl_seconds: int = None):
+        self.path = path or settings.DOI_CACHE_PATH
+        self.ttl_seconds = settings.DOI_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.negative_ttl_seconds = settings.DOI_CACHE_NEGATIVE_TTL_SECONDS if negative_ttl_seconds is None else negative_ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS doi_cache (doi TEXT PRIMARY KEY, url TEXT, resolved_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _is_fresh(self, url: Optional[str], resolved_at: float, now: float) -> bool:
+        ttl_seconds = self.ttl_seconds if url else self.negative_ttl_seconds
+        return not ttl_seconds or now - resolved_at <= ttl_seconds
+
+    def get_many(self, dois: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Returns {doi: url} for every DOI with a fresh entry; the URL is None for DOIs cached
+        as unresolvable. DOIs missing from the result need to be resolved.
+        """
+        now = time.time()
+        cached = {}
+        try:
+            with self._connect() as conn:
+                for start in range(0, len(dois), SQLITE_MAX_VARIABLES):
+                    batch = dois[start:start + SQLITE_MAX_VARIABLES]
+                    placeholders = ", ".join("?" * len(batch))
+                    for doi, url, resolved_at in conn.execute(f"SELECT doi, url, resolved_at FROM doi_cache WHERE doi IN ({placeholders})", batch):
+                        if self._is_fresh(url, resolved_at, now):
+                            cached[doi] = url
+        except sqlite3.Error as e:
+            logger.warning(f"DOI cache lookup failed: {e}")
+        return cached
+
+    def set_many(self, resolutions: Dict[str, Optional[str]]):
+        """Stores resolved URLs, and None for DOIs that could not be resolved."""
+        if not resolutions:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO doi_cache (doi, url, resolved_at) VALUES (?, ?, ?)",
+                    [(doi, url, now) for doi, url in resolutions.items()]
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"DOI cache write failed: {e}")
+
+_doi_cache = None
+
+def get_doi_cache() -> Optional[DOIResolutionCache]:
+    """Returns the process-wide DOI cache, or None when DOI_CACHE_ENABLED is off."""
+    global _doi_cache
+    if not settings.DOI_CACHE_ENABLED:
+        return None
+    if _doi_cache is None:
+        _doi_cache = DOIResolutionCache()
+    return _doi_cache
\ No newline at end of file
@@ -0,0 +1,100 @@
+# utils/embeddings.py
+# Local, CPU-only text embeddings used for fast topic matching and semantic retrieval.
+# The default hashing embedder is deterministic and needs no model download or network.
+
+import logging
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "we", "were", "which", "with", "our",
+    "these", "their", "can", "also", "using", "based", "paper", "study", "approach", "results", "show",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases text and returns word tokens without stopwords, with a naive plural strip."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall((text or "").lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class HashingEmbedder:
+    """
+    Feature-hashing vectorizer over word unigrams and bigrams with sublinear term frequency.
+    Uses crc32 rather than hash() so vectors are identical across processes and runs.
+    """
+    def __init__(self, dim: int = None):
+        self.dim = dim or settings.EMBEDDING_DIM
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = tokenize(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        counts = {}
+        for feature in features:
+            counts[feature] = counts.get(feature, 0) + 1
+        for feature, count in counts.items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dim] += sign * (1.0 + np.log(count))
+        return vector
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Returns an (n, dim) float32 matrix of L2-normalized embeddings."""
+        matrix = np.stack([self._embed_one(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+        return normalize_rows(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """Wraps a local sentence-transformers model, forced onto the CPU."""
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer # Optional dependency
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        matrix = np.asarray(self.model.encode(texts, convert_to_numpy=True), dtype=np.float32).reshape(len(texts), self.dim)
+        return normalize_rows(matrix)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Cosine similarity between the rows of two L2-normalized matrices."""
+    return a @ b.T
+
+_embedder = None
+
+def get_embedder():
+    """
+    Returns the configured embedder, created on first use. EMBEDDING_BACKEND is "hashing" or
+    "sentence-transformers"; the latter falls back to hashing if the package is not installed.
+    """
+    global _embedder
+    if _embedder is None:
+        if settings.EMBEDDING_BACKEND == "sentence-transformers":
+            try:
+                _embedder = SentenceTransformerEmbedder(settings.EMBEDDING_MODEL)
+            except Exception as e:
+                logger.warning(f"Could not load sentence-transformers model {settings.EMBEDDING_MODEL}: {e}. Using hashing embedder.")
+        if _embedder is None:
+            _embedder = HashingEmbedder()
+    return _embedder
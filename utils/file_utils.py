@@ -1,5 +1,6 @@
 import os
 import logging
+from typing import Iterable, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,50 @@ def save_text_to_file(content: str, directory: str, filename: str) -> Optional[s
         logger.error(f"Error saving text to {filename} in {directory}: {e}")
         return None
 
+def save_text_chunks_to_file(chunks: Iterable[str], directory: str, filename: str, flush: bool = False) -> Optional[str]:
+    """
+    Streams text chunks (e.g. PDF pages) into a file without building the full text in memory.
+    With flush=True every chunk is visible to readers as soon as it is written (e.g. streamed LLM output).
+    Returns None, and removes the partial file, if an error occurs or no text was written.
+    """
+    file_path = os.path.join(directory, filename)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        has_content = False
+        with open(file_path, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+                    if flush:
+                        f.flush()
+                    has_content = has_content or not chunk.isspace()
+        if not has_content:
+            os.remove(file_path)
+            logger.warning(f"No text written to {file_path}")
+            return None
+        logger.info(f"Text streamed to {file_path}")
+        return file_path
+    except Exception as e:
+        logger.error(f"Error streaming text to {filename} in {directory}: {e}")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return None
+
+def stream_text_to_file(chunks: Iterable[str], directory: str, filename: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Writes streamed text (e.g. LLM output) to a file chunk by chunk, flushing each so the file
+    can be followed while it grows. Returns (file_path, full_text), or (None, None) on failure.
+    """
+    parts = []
+    def collect():
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    file_path = save_text_chunks_to_file(collect(), directory, filename, flush=True)
+    if not file_path:
+        return None, None
+    return file_path, "".join(parts).strip()
+
 def generate_unique_filename(base_name: str, extension: str, directory: str) -> str:
     """Generates a unique filename to avoid overwrites."""
     counter = 0
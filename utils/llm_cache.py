@@ -0,0 +1,167 @@
+# utils/llm_cache.py
+# Persistent prompt -> response cache for LLM calls, so task retries and re-runs
+# of deterministic prompts don't pay for the same completion twice.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(model: str, prompt: str, **sampling_params) -> str:
+    """Builds a cache key from the model, a hash of the prompt and the sampling parameters."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    params = json.dumps(sampling_params, sort_keys=True)
+    return hashlib.sha256(f"{model}\n{prompt_hash}\n{params}".encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """Stores responses in a single SQLite file shared by all worker processes."""
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_accessed ON llm_cache (last_accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache_stats (model TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0, misses INTEGER NOT NULL DEFAULT 0)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str, ttl_seconds: int) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            response, created_at = row
+            if ttl_seconds and now - created_at > ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key))
+            return response
+
+    def set(self, key: str, model: str, response: str, max_entries: int):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            if max_entries:
+                # Evict least recently used entries beyond the limit
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+                    (max_entries,)
+                )
+
+    def record(self, model: str, hit: bool):
+        column = "hits" if hit else "misses"
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO llm_cache_stats (model) VALUES (?)", (model,))
+            conn.execute(f"UPDATE llm_cache_stats SET {column} = {column} + 1 WHERE model = ?", (model,))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT model, hits, misses FROM llm_cache_stats").fetchall()
+        return {model: {"hits": hits, "misses": misses} for model, hits, misses in rows}
+
+
+class DiskCacheBackend:
+    """Stores one JSON file per response in a directory; file mtime tracks recency."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._stats: Dict[str, Dict[str, int]] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str, ttl_seconds: int) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if ttl_seconds and time.time() - entry["created_at"] > ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        os.utime(path, None)
+        return entry["response"]
+
+    def set(self, key: str, model: str, response: str, max_entries: int):
+        with open(self._path(key), "w", encoding="utf-8") as f:
+            json.dump({"model": model, "response": response, "created_at": time.time()}, f)
+        if max_entries:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+            if len(entries) > max_entries:
+                entries.sort(key=lambda e: e.stat().st_mtime)
+                for entry in entries[:len(entries) - max_entries]:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+    def record(self, model: str, hit: bool):
+        # Counters are per process for the disk backend
+        model_stats = self._stats.setdefault(model, {"hits": 0, "misses": 0})
+        model_stats["hits" if hit else "misses"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {model: dict(counts) for model, counts in self._stats.items()}
+
+
+class LLMResponseCache:
+    """
+    Prompt-response cache keyed on model, prompt hash and sampling parameters.
+    Entries expire after ttl_seconds and the least recently used are evicted beyond max_entries.
+    """
+    def __init__(self, backend: str = None, path: str = None, ttl_seconds: int = None, max_entries: int = None):
+        backend = backend or settings.LLM_CACHE_BACKEND
+        path = path or settings.LLM_CACHE_PATH
+        self.ttl_seconds = settings.LLM_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = settings.LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        if backend == "sqlite":
+            self.backend = SQLiteCacheBackend(path)
+        elif backend == "disk":
+            self.backend = DiskCacheBackend(path)
+        else:
+            raise ValueError(f"Unsupported LLM cache backend: {backend}")
+
+    def get(self, model: str, prompt: str, **sampling_params) -> Optional[str]:
+        """Returns the cached response, recording a hit or miss for the model."""
+        try:
+            response = self.backend.get(make_cache_key(model, prompt, **sampling_params), self.ttl_seconds)
+            self.backend.record(model, hit=response is not None)
+            return response
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+    def set(self, model: str, prompt: str, response: str, **sampling_params):
+        try:
+            self.backend.set(make_cache_key(model, prompt, **sampling_params), model, response, self.max_entries)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns hit/miss counters per model."""
+        try:
+            return self.backend.stats()
+        except Exception as e:
+            logger.warning(f"Failed to read LLM cache stats: {e}")
+            return {}
@@ -1,9 +1,135 @@
 # utils/llm_utils.py
 
-# ... (existing imports)
+import logging
+from typing import Iterator, Optional
+
+import openai
 from google.cloud import texttospeech # Add this import if using Google Cloud TTS
 
-# ... (LLMService class and instances)
+from config import settings
+from utils.llm_cache import LLMResponseCache
+from utils.rate_limiter import throttle
+
+logger = logging.getLogger(__name__)
+
+_response_cache: Optional[LLMResponseCache] = None
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Returns the shared LLM response cache, creating it on first use. None if caching is disabled."""
+    global _response_cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = LLMResponseCache()
+    return _response_cache
+
+class LLMService:
+    """Wrapper around an OpenAI-compatible chat completion API for one model."""
+    def __init__(self, model: str):
+        self.model = model
+        self._client = None # Created on first use so importing agents doesn't require an API key
+
+    @property
+    def client(self) -> openai.OpenAI:
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.LLM_BASE_URL or None)
+        return self._client
+
+    def _get_cache(self, temperature: float, use_cache: bool) -> Optional[LLMResponseCache]:
+        if use_cache and (temperature <= 0 or not settings.LLM_CACHE_BYPASS_NONDETERMINISTIC):
+            return get_response_cache()
+        return None
+
+    def generate_text(self, prompt: str, max_tokens: int = 500, temperature: float = 0.7, use_cache: bool = True) -> Optional[str]:
+        """
+        Generates a completion for the prompt. Responses are served from and stored in the
+        response cache, unless use_cache is False or the temperature makes the output
+        non-deterministic and LLM_CACHE_BYPASS_NONDETERMINISTIC is set.
+        """
+        cache = self._get_cache(temperature, use_cache)
+        if cache:
+            cached_response = cache.get(self.model, prompt, max_tokens=max_tokens, temperature=temperature)
+            if cached_response is not None:
+                logger.info(f"LLM cache hit for model {self.model}")
+                return cached_response
+
+        try:
+            throttle(f"llm:{self.model}") # Stay within the provider's request quota
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+            text = (response.choices[0].message.content or "").strip()
+            usage = getattr(response, "usage", None)
+            if usage:
+                # Provider-reported counts, to compare against the prompt builder's local estimate
+                logger.info(f"LLM usage for {self.model}: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion tokens")
+        except Exception as e:
+            logger.error(f"Error generating text with {self.model}: {e}")
+            return None
+
+        if cache and text:
+            cache.set(self.model, prompt, text, max_tokens=max_tokens, temperature=temperature)
+        return text
+
+    def stream_text(self, prompt: str, max_tokens: int = 500, temperature: float = 0.7, use_cache: bool = True) -> Iterator[str]:
+        """
+        Yields the completion in chunks as the API produces them, so callers can persist and show
+        output before the whole response is done. Cached responses, and every response when
+        LLM_STREAMING_ENABLED is off, arrive as a single chunk. The full text is cached once the
+        stream completes. Unlike generate_text, API errors are raised (after yielding any partial
+        output) so the caller can discard what it wrote.
+        """
+        if not settings.LLM_STREAMING_ENABLED:
+            text = self.generate_text(prompt, max_tokens=max_tokens, temperature=temperature, use_cache=use_cache)
+            if text:
+                yield text
+            return
+
+        cache = self._get_cache(temperature, use_cache)
+        if cache:
+            cached_response = cache.get(self.model, prompt, max_tokens=max_tokens, temperature=temperature)
+            if cached_response is not None:
+                logger.info(f"LLM cache hit for model {self.model}")
+                yield cached_response
+                return
+
+        parts = []
+        try:
+            throttle(f"llm:{self.model}") # Stay within the provider's request quota
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}, # Usage arrives in a final chunk without choices
+            )
+            for chunk in stream:
+                if chunk.usage:
+                    logger.info(f"LLM usage for {self.model}: {chunk.usage.prompt_tokens} prompt + {chunk.usage.completion_tokens} completion tokens")
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if not content:
+                    continue
+                if not parts:
+                    content = content.lstrip() # Match generate_text, which strips the response
+                    if not content:
+                        continue
+                parts.append(content)
+                yield content
+        except Exception as e:
+            logger.error(f"Error streaming text with {self.model}: {e}")
+            raise
+
+        text = "".join(parts).strip()
+        if cache and text:
+            cache.set(self.model, prompt, text, max_tokens=max_tokens, temperature=temperature)
+
+classification_llm = LLMService(settings.CLASSIFICATION_LLM_MODEL)
+summary_llm = LLMService(settings.SUMMARY_LLM_MODEL)
+synthesis_llm = LLMService(settings.SYNTHESIS_LLM_MODEL)
 
 def generate_audio_from_text(text: str, output_path: str, provider: str = "openai") -> Optional[str]:
     """Generates audio from text using a specified TTS provider."""
@@ -1,37 +1,138 @@
 import fitz # PyMuPDF
 import logging
+from typing import Iterator, List, Optional, Tuple
+
+from billiard.pool import Pool # Celery's multiprocessing fork: pools can start inside prefork (daemonic) workers
+
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+_parse_pool: Optional[Pool] = None # Created lazily and reused across tasks
+_parse_pool_unavailable = False # Set once the pool cannot be started, so later PDFs go straight to inline parsing
+
+def iter_text_from_pdf(pdf_path: str) -> Iterator[str]:
+    """
+    Yields the text of each page of a PDF file as it is parsed.
+    Only one page is held in memory at a time; errors are raised to the caller.
+    """
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            yield page.get_text()
+    logger.info(f"Successfully streamed text from {pdf_path}")
+
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extracts text from a PDF file using PyMuPDF."""
-    text = ""
     try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                text += page.get_text()
+        text = "".join(iter_text_from_pdf(pdf_path))
         logger.info(f"Successfully extracted text from {pdf_path}")
     except Exception as e:
         logger.error(f"Error extracting text from PDF {pdf_path}: {e}")
         text = "" # Return empty string on failure
     return text
 
+def _metadata_from_document(doc) -> dict:
+    """Reads basic metadata from an already opened PyMuPDF document."""
+    meta = doc.metadata or {}
+    return {
+        'title': meta.get('title', 'No Title'),
+        'author': meta.get('author', 'No Author'),
+        'creation_date': meta.get('creationDate', None),
+        'mod_date': meta.get('modDate', None),
+        'page_count': doc.page_count,
+        # Add more fields as needed
+    }
+
 def extract_metadata_from_pdf(pdf_path: str) -> dict:
     """Extracts basic metadata from a PDF file."""
     metadata = {}
     try:
         with fitz.open(pdf_path) as doc:
-            meta = doc.metadata
-            metadata['title'] = meta.get('title', 'No Title')
-            metadata['author'] = meta.get('author', 'No Author')
-            metadata['creation_date'] = meta.get('creationDate', None)
-            metadata['mod_date'] = meta.get('modDate', None)
-            # Add more fields as needed
+            metadata = _metadata_from_document(doc)
         logger.info(f"Successfully extracted metadata from {pdf_path}")
     except Exception as e:
         logger.error(f"Error extracting metadata from PDF {pdf_path}: {e}")
     return metadata
 
-# You could add more advanced functions here for:
-# - extract_sections_from_text(text: str) -> dict: Use regex/LLM to identify Introduction, Methods, Results, Conclusion
-# - extract_figures_tables(pdf_path: str) -> list: More complex, might involve image processing or advanced PyMuPDF features
\ No newline at end of file
+def split_page_ranges(page_count: int, pages_per_chunk: int) -> List[Tuple[int, int]]:
+    """Splits a document into consecutive (start, stop) page ranges."""
+    pages_per_chunk = max(1, pages_per_chunk)
+    return [(start, min(start + pages_per_chunk, page_count)) for start in range(0, page_count, pages_per_chunk)]
+
+def extract_text_from_page_range(pdf_path: str, start: int, stop: int) -> str:
+    """Extracts the text of pages [start, stop). Runs inside the parsing process pool."""
+    with fitz.open(pdf_path) as doc:
+        return "".join(doc[page_number].get_text() for page_number in range(start, stop))
+
+def _get_parse_pool(max_workers: int) -> Optional[Pool]:
+    """Returns the shared parsing pool, or None if it cannot be started in this process."""
+    global _parse_pool, _parse_pool_unavailable
+    if _parse_pool is None and not _parse_pool_unavailable:
+        try:
+            _parse_pool = Pool(processes=max_workers)
+        except Exception as e:
+            _parse_pool_unavailable = True
+            logger.warning(f"Cannot start the PDF parsing pool ({e}). Large PDFs will be parsed inline in this process.")
+    return _parse_pool
+
+def _iter_text_from_open_document(doc) -> Iterator[str]:
+    """Yields page text from a document that is already open, closing it when done."""
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+def _iter_text_from_page_ranges(pdf_path: str, page_ranges: List[Tuple[int, int]], max_workers: int) -> Iterator[str]:
+    """
+    Parses page ranges across the process pool and yields their text in document order.
+    At most two ranges per worker are in flight, so finished text is written out rather than buffered.
+    """
+    global _parse_pool
+    completed = 0
+    pool = _get_parse_pool(max_workers)
+    if pool is not None:
+        try:
+            pending = []
+            for start, stop in page_ranges[:max_workers * 2]:
+                pending.append(pool.apply_async(extract_text_from_page_range, (pdf_path, start, stop)))
+            next_index = len(pending)
+            while pending:
+                text = pending.pop(0).get()
+                completed += 1
+                yield text
+                if next_index < len(page_ranges):
+                    pending.append(pool.apply_async(extract_text_from_page_range, (pdf_path, *page_ranges[next_index])))
+                    next_index += 1
+            return
+        except Exception as e:
+            # A lost worker or a range that failed in the pool: finish the remaining ranges inline, where a
+            # genuine parsing error is raised to the caller. The pool is recreated for the next PDF
+            logger.warning(f"Parallel parsing of {pdf_path} failed ({e}). Continuing inline.")
+            if _parse_pool is not None:
+                _parse_pool.terminate()
+                _parse_pool = None
+    for start, stop in page_ranges[completed:]:
+        yield extract_text_from_page_range(pdf_path, start, stop)
+
+def parse_pdf(pdf_path: str, max_workers: Optional[int] = None, pages_per_chunk: Optional[int] = None) -> Tuple[dict, Iterator[str]]:
+    """
+    Opens a PDF once to read its metadata and page count, and returns (metadata, text_chunks).
+    Small documents are parsed inline from that same handle; large ones are split into page
+    ranges that are parsed across a process pool and yielded back in order.
+    """
+    max_workers = max_workers or settings.PDF_PARSE_WORKERS
+    pages_per_chunk = pages_per_chunk or settings.PDF_PARSE_PAGES_PER_CHUNK
+
+    doc = fitz.open(pdf_path)
+    metadata = _metadata_from_document(doc)
+    page_count = doc.page_count
+    if max_workers <= 1 or page_count < max(settings.PDF_PARSE_PARALLEL_MIN_PAGES, pages_per_chunk * 2):
+        return metadata, _iter_text_from_open_document(doc)
+
+    doc.close()
+    page_ranges = split_page_ranges(page_count, pages_per_chunk)
+    logger.info(f"Parsing {pdf_path} ({page_count} pages) as {len(page_ranges)} ranges across {max_workers} processes")
+    return metadata, _iter_text_from_page_ranges(pdf_path, page_ranges, max_workers)
+
+# Section, keyword and figure/table caption extraction lives in agents/info_extraction_agent.py
\ No newline at end of file
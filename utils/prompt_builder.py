@@ -0,0 +1,143 @@
+# utils/prompt_builder.py
+# Token-budgeted prompt construction shared by the LLM agents. Content is packed in priority
+# order (e.g. abstract, then key sections, then the rest) until the prompt reaches the model's
+# input budget, instead of cutting inputs at arbitrary character counts, and every built
+# prompt's token usage is logged.
+
+import logging
+from typing import Dict, List, Optional
+
+from config import settings
+from utils.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+MIN_TRUNCATED_PART_TOKENS = 64 # A part cut shorter than this is dropped instead
+
+def parse_context_windows(spec: str) -> Dict[str, int]:
+    """Parses "model=tokens,model=tokens" into {model: tokens}, skipping malformed entries."""
+    windows = {}
+    for entry in (spec or "").split(","):
+        model, _, tokens = entry.strip().partition("=")
+        try:
+            windows[model.strip()] = int(tokens)
+        except ValueError:
+            if entry.strip():
+                logger.warning(f"Ignoring malformed LLM_CONTEXT_WINDOWS entry '{entry}'")
+    return windows
+
+def get_context_window(model: str) -> int:
+    """
+    Returns the context window of a model: an exact LLM_CONTEXT_WINDOWS entry, else the longest
+    entry the model name starts with (so dated versions match), else LLM_DEFAULT_CONTEXT_WINDOW.
+    Provider prefixes such as "openai/" are ignored.
+    """
+    windows = parse_context_windows(settings.LLM_CONTEXT_WINDOWS)
+    name = model.split("/")[-1]
+    if name in windows:
+        return windows[name]
+    prefixes = [prefix for prefix in windows if name.startswith(prefix)]
+    return windows[max(prefixes, key=len)] if prefixes else settings.LLM_DEFAULT_CONTEXT_WINDOW
+
+def input_token_budget(model: str, max_output_tokens: int, cap: Optional[int] = None) -> int:
+    """Tokens available for the prompt: the context window minus the completion and a safety margin, optionally capped."""
+    budget = get_context_window(model) - max_output_tokens - settings.PROMPT_SAFETY_MARGIN_TOKENS
+    if cap:
+        budget = min(budget, cap)
+    return max(0, budget)
+
+
+class PromptBuilder:
+    """
+    Fills a prompt template's {content} field with budgeted parts.
+
+        builder = PromptBuilder("summary", summary_llm.model, max_output_tokens=250, max_input_tokens=4000)
+        builder.add(paper.abstract, label="Abstract", priority=0)
+        builder.add(full_text, label="Full Text", priority=1)
+        prompt = builder.build(TEMPLATE, title=paper.title)
+
+    Parts are packed by priority (lowest first, then insertion order): each part is included whole
+    if it fits the remaining budget, otherwise truncated, and later parts are dropped once the
+    budget is spent. Included parts are rendered in insertion order. Item lists (add_items) are
+    packed whole items at a time, in their given order.
+    """
+    def __init__(self, name: str, model: str, max_output_tokens: int, max_input_tokens: Optional[int] = None):
+        self.name = name
+        self.model = model
+        self.budget = input_token_budget(model, max_output_tokens, max_input_tokens)
+        self._parts = [] # [label, text or list of items, priority, separator]
+        self.usage = {}
+
+    def add(self, text: Optional[str], label: Optional[str] = None, priority: int = 0):
+        """Adds a text part. Empty text is ignored."""
+        if text and text.strip():
+            self._parts.append([label, text.strip(), priority, None])
+
+    def add_items(self, items: List[str], label: Optional[str] = None, priority: int = 0, separator: str = "\n\n---\n\n"):
+        """Adds a list of items (e.g. summaries ranked by relevance) that are included or dropped whole."""
+        items = [item for item in items if item and item.strip()]
+        if items:
+            self._parts.append([label, items, priority, separator])
+
+    @property
+    def has_content(self) -> bool:
+        return bool(self._parts)
+
+    def _render(self, label: Optional[str], text: str) -> str:
+        return f"{label}:\n{text}" if label else text
+
+    def build(self, template: str, **fields) -> str:
+        """
+        Returns the template formatted with the fields and the packed parts as {content}.
+        Token usage is stored in self.usage and logged.
+        """
+        fixed_tokens = count_tokens(template.format(content="", **fields))
+        remaining = self.budget - fixed_tokens
+        packed = {} # Part index -> rendered text
+        truncated, dropped, dropped_items, included_items = [], [], 0, 0
+        for index in sorted(range(len(self._parts)), key=lambda i: self._parts[i][2]):
+            label, value, _, separator = self._parts[index]
+            part_name = label or f"part {index + 1}"
+            header_tokens = count_tokens(self._render(label, "")) + 2 # Label line and the blank line between parts
+            if isinstance(value, list):
+                kept = []
+                used = header_tokens
+                for item in value:
+                    item_tokens = count_tokens(item) + count_tokens(separator)
+                    if used + item_tokens > remaining:
+                        break
+                    kept.append(item)
+                    used += item_tokens
+                dropped_items += len(value) - len(kept)
+                included_items += len(kept)
+                if kept:
+                    packed[index] = self._render(label, separator.join(kept))
+                    remaining -= used
+                else:
+                    dropped.append(part_name)
+                continue
+
+            text_tokens = count_tokens(value)
+            if header_tokens + text_tokens <= remaining:
+                packed[index] = self._render(label, value)
+                remaining -= header_tokens + text_tokens
+            elif remaining - header_tokens >= MIN_TRUNCATED_PART_TOKENS:
+                packed[index] = self._render(label, truncate_to_tokens(value, remaining - header_tokens))
+                truncated.append(part_name)
+                remaining = 0
+            else:
+                dropped.append(part_name)
+
+        prompt = template.format(content="\n\n".join(packed[i] for i in sorted(packed)), **fields)
+        self.usage = {
+            "name": self.name, "model": self.model, "budget": self.budget,
+            "prompt_tokens": count_tokens(prompt), "truncated": truncated, "dropped": dropped,
+            "included_items": included_items, "dropped_items": dropped_items,
+        }
+        logger.info(
+            f"Prompt '{self.name}' for {self.model}: {self.usage['prompt_tokens']}/{self.budget} tokens"
+            + (f", truncated {', '.join(truncated)}" if truncated else "")
+            + (f", dropped {', '.join(dropped)}" if dropped else "")
+            + (f", dropped {dropped_items} items" if dropped_items else "")
+        )
+        return prompt
\ No newline at end of file
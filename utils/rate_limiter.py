@@ -0,0 +1,150 @@
+# utils/rate_limiter.py
+# Token-bucket rate limiting shared by all worker processes, so requests to each external
+# host/API are paced to its quota up front instead of failing with 429s and retrying later.
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Reserves `requested` tokens and returns how long the caller must wait for them (seconds).
+# Tokens may go negative, so concurrent callers queue up behind each other instead of all
+# retrying at once. Uses the Redis server clock so every host shares one time source.
+_REDIS_RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate) - requested
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    """Parses "host=rate,api=rate" into {key: requests per second}, skipping malformed entries."""
+    limits = {}
+    for entry in (spec or "").split(","):
+        key, _, rate = entry.partition("=")
+        try:
+            limits[key.strip().lower()] = float(rate)
+        except ValueError:
+            if entry.strip():
+                logger.warning(f"Ignoring malformed rate limit entry: '{entry}'")
+    return limits
+
+
+class SQLiteRateLimiterBackend:
+    """Keeps bucket state in a local SQLite file; BEGIN IMMEDIATE serializes updates across processes."""
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limit_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def reserve(self, key: str, rate: float, capacity: float, requested: float) -> float:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate) - requested
+            conn.execute("INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+            return max(0.0, -tokens / rate)
+        finally:
+            conn.close()
+
+
+class RedisRateLimiterBackend:
+    """Keeps bucket state in Redis, updated atomically by a Lua script; works across machines."""
+    def __init__(self, url: str):
+        import redis # Already installed alongside Celery's Redis broker
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(_REDIS_RESERVE_SCRIPT)
+
+    def reserve(self, key: str, rate: float, capacity: float, requested: float) -> float:
+        return float(self.script(keys=[f"rate_limit:{key}"], args=[rate, capacity, requested]))
+
+
+class RateLimiter:
+    """
+    Per-key token buckets. A key is a host name (e.g. "api.crossref.org") or an API name such
+    as "llm:gpt-4o"; its rate comes from RATE_LIMITS, then from the part before ":", then
+    RATE_LIMIT_DEFAULT_PER_SECOND. Buckets hold RATE_LIMIT_BURST_SECONDS worth of tokens.
+    """
+    def __init__(self, backend: str = None, limits: Dict[str, float] = None):
+        backend = backend or settings.RATE_LIMITER_BACKEND
+        self.limits = parse_rate_limits(settings.RATE_LIMITS) if limits is None else limits
+        if backend == "sqlite":
+            self.backend = SQLiteRateLimiterBackend(settings.RATE_LIMITER_PATH)
+        elif backend == "redis":
+            self.backend = RedisRateLimiterBackend(settings.RATE_LIMITER_REDIS_URL or settings.CELERY_BROKER_URL)
+        else:
+            raise ValueError(f"Unsupported rate limiter backend: {backend}")
+
+    def rate_for(self, key: str) -> float:
+        key = key.lower()
+        if key in self.limits:
+            return self.limits[key]
+        return self.limits.get(key.split(":", 1)[0], settings.RATE_LIMIT_DEFAULT_PER_SECOND)
+
+    def acquire(self, key: str, tokens: float = 1.0) -> float:
+        """
+        Blocks until `tokens` are available for key and returns the seconds waited.
+        Fails open (no waiting) if the backend is unavailable.
+        """
+        rate = self.rate_for(key)
+        if rate <= 0:
+            return 0.0 # Unlimited
+        capacity = max(tokens, rate * settings.RATE_LIMIT_BURST_SECONDS)
+        try:
+            wait = self.backend.reserve(key.lower(), rate, capacity, tokens)
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable for '{key}': {e}")
+            return 0.0
+        if wait > 0:
+            logger.debug(f"Rate limiting '{key}': waiting {wait:.2f}s")
+            time.sleep(wait)
+        return wait
+
+_rate_limiter = None
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Returns the process-wide rate limiter, or None when RATE_LIMITER_ENABLED is off."""
+    global _rate_limiter
+    if not settings.RATE_LIMITER_ENABLED:
+        return None
+    if _rate_limiter is None:
+        try:
+            _rate_limiter = RateLimiter()
+        except Exception as e:
+            logger.warning(f"Could not create rate limiter: {e}")
+            return None
+    return _rate_limiter
+
+def throttle(key: str, tokens: float = 1.0) -> float:
+    """Waits for the key's rate limit, if rate limiting is enabled. Returns the seconds waited."""
+    limiter = get_rate_limiter()
+    return limiter.acquire(key, tokens) if limiter else 0.0
+
+def throttle_url(url: str) -> float:
+    """Waits for the rate limit of the URL's host."""
+    return throttle(urlsplit(url).hostname or url)
\ No newline at end of file
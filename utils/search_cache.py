@@ -0,0 +1,71 @@
+# utils/search_cache.py
+# Persistent cache of search results, so repeating a keyword/year search (or re-reading a page
+# of it) doesn't query the academic APIs again until the entry expires.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+def make_search_cache_key(**query) -> str:
+    """Builds a cache key from the query parameters (keywords, year, sources, fields, page...)."""
+    query["keywords"] = " ".join(str(query.get("keywords") or "").lower().split())
+    return hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+    """SQLite-backed cache of JSON-serializable search results, shared by all worker processes."""
+    def __init__(self, path: str = None, ttl_seconds: int = None):
+        self.path = path or settings.SEARCH_CACHE_PATH
+        self.ttl_seconds = settings.SEARCH_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, results TEXT NOT NULL, created_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT results, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+                if not row:
+                    return None
+                results, created_at = row
+                if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    return None
+                return json.loads(results)
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Search cache lookup failed: {e}")
+            return None
+
+    def set(self, key: str, results: Any):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, results, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(results), time.time())
+                )
+                if self.ttl_seconds:
+                    conn.execute("DELETE FROM search_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache write failed: {e}")
+
+_search_cache = None
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """Returns the process-wide search cache, or None when SEARCH_CACHE_ENABLED is off."""
+    global _search_cache
+    if not settings.SEARCH_CACHE_ENABLED:
+        return None
+    if _search_cache is None:
+        _search_cache = SearchResultCache()
+    return _search_cache
\ No newline at end of file
@@ -0,0 +1,301 @@
+# utils/search_sources.py
+# Federated paper search: queries Semantic Scholar, arXiv and CrossRef concurrently,
+# deduplicates their results and merges the per-source rankings.
+# With SEARCH_OFFLINE set, each source answers from a saved API response in SEARCH_FIXTURES_DIR.
+
+import base64
+import json
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+from database.crud import normalize_title
+from utils.rate_limiter import throttle_url
+from utils.search_cache import get_search_cache, make_search_cache_key
+from utils.web_scraper import get_http_session
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60 # Reciprocal rank fusion constant; dampens the weight of top ranks
+# Fields of a normalized search result; part of the cache key so cached results match the current format
+SEARCH_FIELDS = ("title", "abstract", "authors", "publication_year", "doi", "arxiv_id", "url", "source_api", "sources")
+ATOM_NS = {"atom": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
+_ARXIV_ID_PATTERN = re.compile(r"(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?$", re.IGNORECASE)
+
+def _year_range(year: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parses "2023" or "2019-2023" into an inclusive (start, end) range."""
+    match = re.fullmatch(r"\s*(\d{4})\s*(?:-\s*(\d{4})\s*)?", year or "")
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2) or match.group(1))
+
+def _arxiv_id(value: Optional[str]) -> Optional[str]:
+    """Extracts a version-less arXiv identifier from an ID or abs/pdf URL."""
+    match = _ARXIV_ID_PATTERN.search((value or "").strip().rstrip("/").removesuffix(".pdf"))
+    return match.group(1).lower() if match else None
+
+def _load_fixture(file_name: str) -> str:
+    with open(os.path.join(settings.SEARCH_FIXTURES_DIR, file_name), "r", encoding="utf-8") as f:
+        return f.read()
+
+def _get(url: str, params: dict, headers: dict = None):
+    throttle_url(url)
+    response = get_http_session().get(url, params=params, headers=headers, timeout=settings.SEARCH_SOURCE_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response
+
+def search_semantic_scholar(keywords: str, year: Optional[str], limit: int, offset: int = 0) -> List[Dict]:
+    """Searches the Semantic Scholar Graph API."""
+    if settings.SEARCH_OFFLINE:
+        data = json.loads(_load_fixture("semantic_scholar.json"))
+        data["data"] = (data.get("data") or [])[offset:offset + limit]
+    else:
+        params = {"query": keywords, "offset": offset, "limit": limit, "fields": "title,abstract,authors,year,externalIds,url,venue"}
+        if year:
+            params["year"] = year
+        headers = {"x-api-key": settings.SEMANTIC_SCHOLAR_API_KEY} if settings.SEMANTIC_SCHOLAR_API_KEY else None
+        data = _get("https://api.semanticscholar.org/graph/v1/paper/search", params, headers).json()
+
+    papers = []
+    for paper in data.get("data") or []:
+        external_ids = paper.get("externalIds") or {}
+        papers.append({
+            'title': paper.get("title"),
+            'abstract': paper.get("abstract"),
+            'authors': ", ".join(a["name"] for a in paper.get("authors") or [] if a.get("name")) or 'N/A',
+            'publication_year': paper.get("year"),
+            'doi': external_ids.get("DOI"),
+            'arxiv_id': _arxiv_id(external_ids.get("ArXiv")),
+            'url': paper.get("url"),
+            'source_api': 'Semantic Scholar'
+        })
+    return papers
+
+def search_arxiv(keywords: str, year: Optional[str], limit: int, offset: int = 0) -> List[Dict]:
+    """Searches the arXiv Atom API; the year filter is applied to the results."""
+    if settings.SEARCH_OFFLINE:
+        feed = _load_fixture("arxiv.xml")
+    else:
+        params = {"search_query": f'all:"{keywords}"', "start": offset, "max_results": limit, "sortBy": "relevance"}
+        feed = _get("https://export.arxiv.org/api/query", params).text
+
+    entries = ET.fromstring(feed).findall("atom:entry", ATOM_NS)
+    if settings.SEARCH_OFFLINE:
+        entries = entries[offset:offset + limit]
+    papers = []
+    for entry in entries:
+        abs_url = entry.findtext("atom:id", default="", namespaces=ATOM_NS).strip()
+        published = entry.findtext("atom:published", default="", namespaces=ATOM_NS)
+        papers.append({
+            'title': " ".join(entry.findtext("atom:title", default="", namespaces=ATOM_NS).split()),
+            'abstract': " ".join(entry.findtext("atom:summary", default="", namespaces=ATOM_NS).split()),
+            'authors': ", ".join(a.findtext("atom:name", default="", namespaces=ATOM_NS) for a in entry.findall("atom:author", ATOM_NS)) or 'N/A',
+            'publication_year': int(published[:4]) if published[:4].isdigit() else None,
+            'doi': entry.findtext("arxiv:doi", default=None, namespaces=ATOM_NS),
+            'arxiv_id': _arxiv_id(abs_url),
+            'url': abs_url,
+            'source_api': 'arXiv'
+        })
+    return papers
+
+def search_crossref(keywords: str, year: Optional[str], limit: int, offset: int = 0) -> List[Dict]:
+    """Searches the CrossRef works API."""
+    if settings.SEARCH_OFFLINE:
+        data = json.loads(_load_fixture("crossref.json"))
+        data["message"]["items"] = data["message"]["items"][offset:offset + limit]
+    else:
+        params = {"query.bibliographic": keywords, "offset": offset, "rows": limit, "select": "DOI,title,author,issued,URL,abstract"}
+        years = _year_range(year)
+        if years:
+            params["filter"] = f"from-pub-date:{years[0]}-01-01,until-pub-date:{years[1]}-12-31"
+        data = _get("https://api.crossref.org/works", params).json()
+
+    papers = []
+    for item in (data.get("message") or {}).get("items") or []:
+        date_parts = ((item.get("issued") or {}).get("date-parts") or [[None]])[0]
+        authors = [" ".join(filter(None, [a.get("given"), a.get("family")])) for a in item.get("author") or []]
+        abstract = item.get("abstract")
+        papers.append({
+            'title': (item.get("title") or [None])[0],
+            'abstract': " ".join(re.sub(r"<[^>]+>", " ", abstract).split()) if abstract else None, # Strip JATS markup
+            'authors': ", ".join(a for a in authors if a) or 'N/A',
+            'publication_year': date_parts[0] if date_parts else None,
+            'doi': item.get("DOI"),
+            'arxiv_id': None,
+            'url': item.get("URL"),
+            'source_api': 'CrossRef'
+        })
+    return papers
+
+SEARCH_SOURCES: Dict[str, Callable[[str, Optional[str], int, int], List[Dict]]] = {
+    "semantic_scholar": search_semantic_scholar,
+    "arxiv": search_arxiv,
+    "crossref": search_crossref,
+}
+
+
+class SearchResultMerger:
+    """
+    Deduplicates papers across sources by DOI, arXiv ID and normalized title, filling in
+    fields a duplicate has that the first copy lacks, and ranks them by reciprocal rank fusion.
+    """
+    def __init__(self):
+        self.papers: List[Dict] = []
+        self.scores: List[float] = []
+        self._index: Dict[str, int] = {}
+
+    @staticmethod
+    def _keys(paper: Dict) -> List[str]:
+        keys = []
+        if paper.get('doi'):
+            keys.append(f"doi:{paper['doi'].lower()}")
+        if paper.get('arxiv_id'):
+            keys.append(f"arxiv:{paper['arxiv_id']}")
+        if normalize_title(paper.get('title')):
+            keys.append(f"title:{normalize_title(paper.get('title'))}")
+        return keys
+
+    def add(self, ranked_papers: List[Dict]) -> None:
+        """Merges one source's ranked results."""
+        for rank, paper in enumerate(ranked_papers):
+            keys = self._keys(paper)
+            if not keys:
+                continue
+            position = next((self._index[k] for k in keys if k in self._index), None)
+            if position is None:
+                position = len(self.papers)
+                self.papers.append(dict(paper, sources=[paper.get('source_api')]))
+                self.scores.append(0.0)
+            else:
+                merged = self.papers[position]
+                for field, value in paper.items():
+                    if value and not merged.get(field):
+                        merged[field] = value
+                merged['sources'].append(paper.get('source_api'))
+            self.scores[position] += 1.0 / (RRF_K + rank + 1)
+            for key in self._keys(self.papers[position]):
+                self._index.setdefault(key, position)
+
+    def ranked(self, limit: int = None) -> List[Dict]:
+        order = sorted(range(len(self.papers)), key=lambda i: self.scores[i], reverse=True)
+        return [self.papers[i] for i in order[:limit]]
+
+
+def _query_sources(keywords: str, year: Optional[str], limit: int, sources: List[str] = None,
+                   offsets: Dict[str, int] = None) -> Iterator[Tuple[str, List[Dict], bool]]:
+    """
+    Queries the sources concurrently and yields (source, results, exhausted) in completion order,
+    so the fastest source is available first. `exhausted` is True when the source returned fewer
+    than `limit` results, i.e. it has no further pages. Failing sources are logged and skipped;
+    sources that exceed SEARCH_SOURCE_TIMEOUT_SECONDS are abandoned.
+    """
+    sources = [s.strip() for s in (sources or settings.SEARCH_SOURCES.split(",")) if s.strip()]
+    offsets = offsets or {}
+    years = _year_range(year)
+    executor = ThreadPoolExecutor(max_workers=max(1, len(sources)))
+    futures = {}
+    for source in sources:
+        search = SEARCH_SOURCES.get(source)
+        if search is None:
+            logger.warning(f"Unknown search source '{source}'. Skipping.")
+            continue
+        futures[executor.submit(search, keywords, year, limit, offsets.get(source, 0))] = source
+    try:
+        for future in as_completed(futures, timeout=settings.SEARCH_SOURCE_TIMEOUT_SECONDS + 5):
+            source = futures[future]
+            try:
+                papers = future.result()
+            except Exception as e:
+                logger.error(f"Search source '{source}' failed for '{keywords}': {e}")
+                continue
+            exhausted = len(papers) < limit
+            if years:
+                papers = [p for p in papers if p.get('publication_year') and years[0] <= p['publication_year'] <= years[1]]
+            logger.info(f"Search source '{source}' returned {len(papers)} papers for '{keywords}'.")
+            yield source, papers[:limit], exhausted
+    except FuturesTimeoutError:
+        logger.warning(f"Search sources timed out for '{keywords}': {[s for f, s in futures.items() if not f.done()]}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _search_cache_key(kind: str, keywords: str, year: Optional[str], limit: int, sources: List[str], cursor: Optional[str] = None) -> str:
+    return make_search_cache_key(
+        kind=kind, keywords=keywords, year=year or "", limit=limit, cursor=cursor,
+        sources=sorted(sources or settings.SEARCH_SOURCES.split(",")), fields=SEARCH_FIELDS, offline=settings.SEARCH_OFFLINE
+    )
+
+def federated_search(keywords: str, year: Optional[str] = None, limit: int = None, sources: List[str] = None) -> List[Dict]:
+    """
+    Queries all sources concurrently and returns up to `limit` deduplicated papers ranked by
+    reciprocal rank fusion of the per-source rankings. Results are served from the search
+    cache when the same query was run within SEARCH_CACHE_TTL_SECONDS. Raises if every source failed.
+    """
+    limit = limit or settings.DEFAULT_SEARCH_LIMIT
+    cache = get_search_cache()
+    cache_key = _search_cache_key("merged", keywords, year, limit, sources)
+    if cache:
+        cached_results = cache.get(cache_key)
+        if cached_results is not None:
+            logger.info(f"Search cache hit for '{keywords}'.")
+            return cached_results
+
+    merger = SearchResultMerger()
+    answered = 0
+    for _, papers, _ in _query_sources(keywords, year, limit, sources):
+        merger.add(papers)
+        answered += 1
+    if not answered:
+        raise RuntimeError(f"No search source answered for '{keywords}'")
+    results = merger.ranked(limit)
+    if cache:
+        cache.set(cache_key, results)
+    return results
+
+def encode_search_cursor(offsets: Dict[str, int]) -> str:
+    """Encodes the next offset of every source that still has results as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(offsets, sort_keys=True).encode("utf-8")).decode("ascii")
+
+def decode_search_cursor(cursor: str) -> Dict[str, int]:
+    return {source: int(offset) for source, offset in json.loads(base64.urlsafe_b64decode(cursor.encode("ascii"))).items()}
+
+def search_page(keywords: str, year: Optional[str] = None, page_size: int = None, cursor: Optional[str] = None,
+                sources: List[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetches one page of federated results: `page_size` results from every source that still has
+    results, deduplicated and ranked within the page. Pass the returned cursor to get the next
+    page; it is None once every source is exhausted. Pages are cached like full searches.
+    """
+    page_size = page_size or settings.SEARCH_PAGE_SIZE
+    sources = [s.strip() for s in (sources or settings.SEARCH_SOURCES.split(",")) if s.strip()]
+    offsets = decode_search_cursor(cursor) if cursor else {source: 0 for source in sources}
+    if not offsets:
+        return [], None
+
+    cache = get_search_cache()
+    cache_key = _search_cache_key("page", keywords, year, page_size, sources, cursor)
+    if cache:
+        cached_page = cache.get(cache_key)
+        if cached_page is not None:
+            logger.info(f"Search cache hit for '{keywords}' page {cursor or 'first'}.")
+            return cached_page["papers"], cached_page["next_cursor"]
+
+    merger = SearchResultMerger()
+    next_offsets = {}
+    answered = 0
+    for source, papers, exhausted in _query_sources(keywords, year, page_size, list(offsets), offsets):
+        merger.add(papers)
+        answered += 1
+        if not exhausted:
+            next_offsets[source] = offsets[source] + page_size
+    if not answered:
+        raise RuntimeError(f"No search source answered for '{keywords}'")
+
+    papers = merger.ranked()
+    next_cursor = encode_search_cursor(next_offsets) if next_offsets else None
+    if cache:
+        cache.set(cache_key, {"papers": papers, "next_cursor": next_cursor})
+    return papers, next_cursor
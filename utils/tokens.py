@@ -0,0 +1,86 @@
+# utils/tokens.py
+# Local token counting and token-bounded text chunking for LLM prompts.
+
+import logging
+import re
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken # Optional: exact counts for OpenAI-style BPE tokenizers
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken when installed. Otherwise approximates BPE tokens as
+    word and punctuation pieces plus a quarter for sub-word splits.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    pieces = len(_PIECE_PATTERN.findall(text))
+    return pieces + pieces // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Returns the longest prefix of text that fits in max_tokens tokens, by the same count as count_tokens."""
+    if not text or max_tokens <= 0:
+        return ""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding.decode(tokens[:max_tokens])
+    # Approximate count: the largest number of pieces whose count (pieces + pieces // 4) stays within the budget
+    max_pieces = max_tokens * 4 // 5
+    while (max_pieces + 1) + (max_pieces + 1) // 4 <= max_tokens:
+        max_pieces += 1
+    for piece_number, match in enumerate(_PIECE_PATTERN.finditer(text), start=1):
+        if piece_number == max_pieces:
+            return text[:match.end()]
+    return text
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Splits a paragraph that exceeds max_tokens on sentence boundaries, then on words."""
+    pieces = []
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words = sentence.split()
+        # Words per piece, leaving headroom for words that split into several tokens
+        step = max(1, int(max_tokens / max(1.0, count_tokens(sentence) / max(1, len(words)))))
+        pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+    return pieces
+
+def split_into_token_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Splits text into consecutive chunks of at most roughly max_tokens tokens, preferring
+    paragraph boundaries, then sentence boundaries, then word boundaries.
+    """
+    if not text or not text.strip():
+        return []
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        paragraph_tokens = count_tokens(paragraph)
+        pieces = [paragraph] if paragraph_tokens <= max_tokens else _split_oversized(paragraph, max_tokens)
+        for piece in pieces:
+            piece_tokens = paragraph_tokens if len(pieces) == 1 else count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
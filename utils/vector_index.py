@@ -0,0 +1,242 @@
+# utils/vector_index.py
+# On-disk embedding store for semantic retrieval over the local corpus.
+# Each named store is a directory holding an append-only float32 matrix (read through np.memmap)
+# and a parallel int64 array of paper IDs. Re-embedding a paper appends a new row; the latest row
+# for an ID wins. Large stores also get an IVF index (k-means lists probed at query time).
+
+import contextlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from utils.embeddings import get_embedder, SentenceTransformerEmbedder
+
+try:
+    import fcntl # Serializes appends from concurrent worker processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PAPER_VECTORS = "papers" # Title + abstract, embedded at ingestion
+SUMMARY_VECTORS = "summaries" # Individual summaries, embedded when they are generated
+
+SEARCH_BLOCK_ROWS = 65536 # Rows scored per block in brute-force search, bounding memory use
+IVF_TRAINING_SAMPLE = 50000
+IVF_KMEANS_ITERATIONS = 10
+IVF_REBUILD_GROWTH = 1.2 # Rebuild the IVF lists once the store grows 20% past the last build
+
+def _embedder_signature(embedder) -> str:
+    """Identifies the embedding space, so vectors from a different embedder are never mixed."""
+    if isinstance(embedder, SentenceTransformerEmbedder):
+        return f"sentence-transformers:{settings.EMBEDDING_MODEL}:{embedder.dim}"
+    return f"{type(embedder).__name__}:{embedder.dim}"
+
+
+class VectorStore:
+    """Memory-mapped embedding matrix plus paper ID array, with an optional IVF index."""
+    def __init__(self, name: str, directory: str = None, dim: int = None, signature: str = None):
+        self.directory = os.path.join(directory or settings.VECTOR_INDEX_DIR, name)
+        if dim is None or signature is None:
+            embedder = get_embedder()
+            dim, signature = embedder.dim, _embedder_signature(embedder)
+        self.dim = dim
+        self.signature = signature
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(self._path("lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta: dict):
+        with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def _compatible(self) -> bool:
+        return self._read_meta().get("signature") == self.signature
+
+    def _load(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (ids, vectors) for every row written so far, with vectors memory-mapped.
+        IDs are written after their vectors, so the ID file length is the number of complete rows.
+        """
+        if not self._compatible() or not os.path.exists(self._path("ids.i64")):
+            return np.zeros(0, dtype=np.int64), np.zeros((0, self.dim), dtype=np.float32)
+        ids = np.fromfile(self._path("ids.i64"), dtype=np.int64)
+        if len(ids) == 0:
+            return ids, np.zeros((0, self.dim), dtype=np.float32)
+        vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(len(ids), self.dim))
+        return ids, vectors
+
+    @staticmethod
+    def _live_mask(ids: np.ndarray) -> np.ndarray:
+        """Marks the most recently written row of each paper ID."""
+        _, last_occurrence = np.unique(ids[::-1], return_index=True)
+        mask = np.zeros(len(ids), dtype=bool)
+        mask[len(ids) - 1 - last_occurrence] = True
+        return mask
+
+    def __len__(self) -> int:
+        ids, _ = self._load()
+        return len(np.unique(ids))
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray):
+        """Appends vectors for the given paper IDs; existing IDs are superseded."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if len(ids) == 0:
+            return
+        with self._lock():
+            if not self._compatible():
+                # A different embedder was configured: start over rather than mix embedding spaces
+                for filename in ("ids.i64", "vectors.f32", "ivf_centroids.npy", "ivf_assignments.npy"):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(self._path(filename))
+                self._write_meta({"signature": self.signature, "dim": self.dim})
+            row_count = os.path.getsize(self._path("ids.i64")) // 8 if os.path.exists(self._path("ids.i64")) else 0
+            with open(self._path("vectors.f32"), "r+b" if os.path.exists(self._path("vectors.f32")) else "wb") as f:
+                f.seek(row_count * self.dim * 4) # Drops any partial row left by an interrupted write
+                f.write(vectors.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._path("ids.i64"), "ab") as f:
+                f.write(ids.tobytes())
+            if settings.VECTOR_INDEX_IVF_MIN_VECTORS and row_count + len(ids) >= settings.VECTOR_INDEX_IVF_MIN_VECTORS:
+                built_rows = self._read_meta().get("ivf_rows", 0)
+                if row_count + len(ids) > built_rows * IVF_REBUILD_GROWTH:
+                    self._build_ivf()
+
+    def get(self, paper_ids: Iterable[int]) -> Dict[int, np.ndarray]:
+        """Returns {paper_id: vector} for the IDs that have been embedded."""
+        ids, vectors = self._load()
+        rows = np.flatnonzero(self._live_mask(ids) & np.isin(ids, list(paper_ids)))
+        return {int(ids[row]): np.array(vectors[row]) for row in rows}
+
+    def _build_ivf(self):
+        """Clusters the rows into ~sqrt(n) lists with spherical k-means. Called with the lock held."""
+        ids, vectors = self._load()
+        n_lists = max(1, int(np.sqrt(len(ids))))
+        rng = np.random.default_rng(0)
+        sample = vectors[np.sort(rng.choice(len(ids), size=min(len(ids), IVF_TRAINING_SAMPLE), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = sample[assignments == list_id]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[list_id] = centroid / (np.linalg.norm(centroid) or 1.0)
+        assignments = np.concatenate([
+            np.argmax(vectors[start:start + SEARCH_BLOCK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, len(ids), SEARCH_BLOCK_ROWS)
+        ]).astype(np.int32)
+        np.save(self._path("ivf_centroids.npy"), centroids)
+        np.save(self._path("ivf_assignments.npy"), assignments)
+        self._write_meta({**self._read_meta(), "ivf_rows": len(ids)})
+        logger.info(f"Built IVF index with {n_lists} lists over {len(ids)} vectors in {self.directory}")
+
+    def _candidate_rows(self, query_vector: np.ndarray, row_count: int) -> Optional[np.ndarray]:
+        """Rows in the IVF lists nearest the query, plus rows added since the last build; None means scan everything."""
+        if not settings.VECTOR_INDEX_IVF_MIN_VECTORS or row_count < settings.VECTOR_INDEX_IVF_MIN_VECTORS:
+            return None
+        try:
+            centroids = np.load(self._path("ivf_centroids.npy"))
+            assignments = np.load(self._path("ivf_assignments.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        probe_lists = np.argsort(-(centroids @ query_vector))[:settings.VECTOR_INDEX_IVF_NPROBE]
+        indexed_rows = np.flatnonzero(np.isin(assignments, probe_lists))
+        return np.concatenate([indexed_rows, np.arange(len(assignments), row_count)])
+
+    def search(self, query_vector: np.ndarray, k: int = 10, candidate_ids: Optional[Iterable[int]] = None,
+               exclude_ids: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """
+        Returns the k most similar papers as [(paper_id, cosine similarity), ...], best first.
+        candidate_ids restricts the search to those papers (scored exactly, without the IVF lists).
+        """
+        ids, vectors = self._load()
+        if len(ids) == 0 or k <= 0:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(self.dim)
+        # Superseded rows and excluded papers are never scored
+        mask = self._live_mask(ids) & ~np.isin(ids, list(exclude_ids))
+        if candidate_ids is not None:
+            rows = np.flatnonzero(mask & np.isin(ids, list(candidate_ids)))
+        else:
+            rows = self._candidate_rows(query_vector, len(ids))
+            rows = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+        if len(rows) == 0:
+            return []
+
+        scores = np.concatenate([
+            vectors[rows[start:start + SEARCH_BLOCK_ROWS]] @ query_vector
+            for start in range(0, len(rows), SEARCH_BLOCK_ROWS)
+        ])
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[rows[i]]), float(scores[i])) for i in top]
+
+_vector_stores = {}
+
+def get_vector_store(name: str) -> Optional[VectorStore]:
+    """Returns the process-wide store with this name, or None when VECTOR_INDEX_ENABLED is off."""
+    if not settings.VECTOR_INDEX_ENABLED:
+        return None
+    if name not in _vector_stores:
+        _vector_stores[name] = VectorStore(name)
+    return _vector_stores[name]
+
+def index_texts(name: str, texts: Dict[int, str]):
+    """Embeds {paper_id: text} and stores the vectors. Failures are logged, never raised."""
+    texts = {paper_id: text for paper_id, text in texts.items() if text}
+    store = get_vector_store(name)
+    if store is None or not texts:
+        return
+    try:
+        store.add(texts.keys(), get_embedder().encode(list(texts.values())))
+    except Exception as e:
+        logger.warning(f"Failed to add {len(texts)} vectors to the '{name}' index: {e}")
+
+def find_related_papers(paper_id: int, k: int = 5) -> List[Tuple[int, float]]:
+    """Returns [(paper_id, similarity), ...] for the papers closest to the given one."""
+    store = get_vector_store(PAPER_VECTORS)
+    if store is None:
+        return []
+    vector = store.get([paper_id]).get(paper_id)
+    if vector is None:
+        return []
+    return store.search(vector, k=k, exclude_ids=[paper_id])
+
+def rank_by_relevance(name: str, query: str, paper_ids: List[int]) -> List[int]:
+    """
+    Returns paper_ids ordered by similarity to the query. Papers without a stored vector rank
+    last, in their original order; without a vector index the order is unchanged.
+    """
+    store = get_vector_store(name)
+    if store is None or len(paper_ids) < 2:
+        return list(paper_ids)
+    ranked = [paper_id for paper_id, _ in store.search(get_embedder().encode([query])[0], k=len(paper_ids), candidate_ids=paper_ids)]
+    ranked_set = set(ranked)
+    return ranked + [paper_id for paper_id in paper_ids if paper_id not in ranked_set]
\ No newline at end of file
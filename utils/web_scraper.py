@@ -1,16 +1,66 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
 from bs4 import BeautifulSoup
+import html
+import importlib.util
 import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config import settings
+from utils.doi_cache import get_doi_cache, normalize_doi
+from utils.rate_limiter import throttle_url
 
 logger = logging.getLogger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the process-wide pooled session, created on first use. Connections are kept alive
+    and reused across calls, with at most HTTP_MAX_CONNECTIONS_PER_HOST open per host.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.HTTP_FETCH_CONCURRENCY, # Number of hosts whose pools are kept
+                pool_maxsize=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                pool_block=True # Wait for a free connection instead of opening extra ones
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({
+                'User-Agent': USER_AGENT,
+                # gzip/deflate always; br (and zstd) when brotli/zstandard are installed for urllib3 to decode
+                'Accept-Encoding': make_headers(accept_encoding=True)['accept-encoding'],
+            })
+            _session = session
+        return _session
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    """Per-host semaphore bounding concurrent requests to one host from this process."""
+    host = urlsplit(url).netloc.lower()
+    with _session_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(settings.HTTP_MAX_CONNECTIONS_PER_HOST)
+        return _host_slots[host]
+
 def get_html_content(url: str) -> str:
     """Fetches HTML content from a given URL."""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+        throttle_url(url) # Pace requests to the host's quota across all workers
+        with _host_slot(url):
+            response = get_http_session().get(url, timeout=settings.HTTP_TIMEOUT_SECONDS)
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
         logger.info(f"Successfully fetched HTML from {url}")
         return response.text
@@ -18,36 +68,160 @@ def get_html_content(url: str) -> str:
         logger.error(f"Error fetching URL {url}: {e}")
         return ""
 
-def extract_text_from_html(html_content: str) -> str:
-    """Extracts readable text from HTML content using BeautifulSoup."""
+# Non-content elements dropped by every extraction backend
+BOILERPLATE_TAGS = ("script", "style", "header", "footer", "nav")
+
+_TAG_ATTRIBUTES = r"""(?:[^>"']|"[^"]*"|'[^']*')*""" # Quoted attribute values may contain ">"
+_BOILERPLATE_PATTERN = re.compile(r"<(%s)\b%s>.*?</\1\s*>" % ("|".join(BOILERPLATE_TAGS), _TAG_ATTRIBUTES), re.IGNORECASE | re.DOTALL)
+_NON_TEXT_PATTERN = re.compile(r"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<![^>]*>|<\?[^>]*>", re.DOTALL)
+_TAG_PATTERN = re.compile(r"</?[a-zA-Z]%s>" % _TAG_ATTRIBUTES)
+
+def _extract_text_stream(html_content: str) -> str:
+    """
+    Tokenizer backend: strips boilerplate blocks, comments and declarations with regexes, then
+    splits on the remaining tags. Builds no tree, so memory stays proportional to the text.
+    Opt-in only: without a tree it cannot match nested boilerplate elements (e.g. a <nav> inside
+    a <nav>), so some boilerplate text can survive that the parser backends remove.
+    """
+    html_content = _NON_TEXT_PATTERN.sub("", html_content)
+    html_content = _BOILERPLATE_PATTERN.sub("<br>", html_content)
+    pieces = (html.unescape(piece).strip() for piece in _TAG_PATTERN.split(html_content))
+    return "\n".join(piece for piece in pieces if piece)
+
+def _extract_text_lxml(html_content: str) -> str:
+    import lxml.html # Optional dependency
+    root = lxml.html.document_fromstring(html_content)
+    for element in list(root.iter(*BOILERPLATE_TAGS)):
+        element.drop_tree() # Keeps the element's tail text, like BeautifulSoup's decompose
+    pieces = (piece.strip() for piece in root.itertext(tag=lxml.html.etree.Element))
+    return "\n".join(piece for piece in pieces if piece)
+
+def _extract_text_selectolax(html_content: str) -> str:
+    from selectolax.lexbor import LexborHTMLParser # Optional dependency
+    tree = LexborHTMLParser(html_content)
+    tree.strip_tags(list(BOILERPLATE_TAGS))
+    if tree.root is None:
+        return ""
+    pieces = (node.text_content.strip() for node in tree.root.traverse(include_text=True) if node.tag == "-text")
+    return "\n".join(piece for piece in pieces if piece)
+
+def _extract_text_beautifulsoup(html_content: str) -> str:
+    soup = BeautifulSoup(html_content, 'html.parser')
+    # Remove script, style, and other non-text elements
+    for script in soup(list(BOILERPLATE_TAGS)):
+        script.decompose()
+    return soup.get_text(separator='\n', strip=True)
+
+HTML_EXTRACTION_BACKENDS = {
+    "selectolax": _extract_text_selectolax,
+    "lxml": _extract_text_lxml,
+    "stream": _extract_text_stream,
+    "beautifulsoup": _extract_text_beautifulsoup,
+}
+
+def _is_installed(module_name: str) -> bool:
+    return importlib.util.find_spec(module_name) is not None
+
+def get_html_extraction_backend(name: str = None) -> str:
+    """
+    Resolves HTML_EXTRACTION_BACKEND. "auto" picks selectolax, then lxml when installed, and
+    otherwise BeautifulSoup; the stream tokenizer is only used when asked for explicitly.
+    """
+    name = (name or settings.HTML_EXTRACTION_BACKEND).lower()
+    if name == "auto":
+        if _is_installed("selectolax"):
+            return "selectolax"
+        return "lxml" if _is_installed("lxml") else "beautifulsoup"
+    if name not in HTML_EXTRACTION_BACKENDS:
+        logger.warning(f"Unknown HTML extraction backend '{name}'. Using BeautifulSoup.")
+        return "beautifulsoup"
+    return name
+
+def extract_text_from_html(html_content: str, backend: str = None) -> str:
+    """
+    Extracts readable text from HTML content, one line per text node, dropping script, style,
+    header, footer and nav elements. Uses the configured fast backend and falls back to
+    BeautifulSoup if it fails.
+    """
     if not html_content:
         return ""
+    backend = get_html_extraction_backend(backend)
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        # Remove script, style, and other non-text elements
-        for script in soup(["script", "style", "header", "footer", "nav"]):
-            script.decompose()
-        text = soup.get_text(separator='\n', strip=True)
-        return text
+        return HTML_EXTRACTION_BACKENDS[backend](html_content)
     except Exception as e:
+        if backend != "beautifulsoup":
+            logger.warning(f"{backend} HTML extraction failed ({e}). Falling back to BeautifulSoup.")
+            try:
+                return _extract_text_beautifulsoup(html_content)
+            except Exception as fallback_error:
+                e = fallback_error
         logger.error(f"Error extracting text from HTML: {e}")
         return ""
 
-def resolve_doi_to_url(doi: str) -> Optional[str]:
-    """Resolves a DOI to its primary URL using CrossRef API."""
-    if not doi:
-        return None
-    url = f"https://api.crossref.org/works/{doi}/agency"
+# Responses worth retrying later; any other failure is cached as unresolvable
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+def _lookup_doi(doi: str) -> Tuple[Optional[str], bool]:
+    """
+    Looks a DOI up on the CrossRef works API. Returns (url, definitive); definitive is False
+    for timeouts, connection errors and transient HTTP statuses, which must not be cached.
+    """
+    url = f"https://api.crossref.org/works/{doi}" # The works record carries the DOI's resolvable URL
     try:
-        response = requests.get(url, timeout=5)
+        throttle_url(url)
+        with _host_slot(url):
+            response = get_http_session().get(url, timeout=5)
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            logger.warning(f"Transient error {response.status_code} resolving DOI {doi}.")
+            return None, False
         response.raise_for_status()
         data = response.json()
         if data and 'message' in data and 'URL' in data['message']:
             logger.info(f"Resolved DOI {doi} to URL: {data['message']['URL']}")
-            return data['message']['URL']
-    except requests.exceptions.RequestException as e:
+            return data['message']['URL'], True
+        return None, True
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"Error resolving DOI {doi}: {e}")
+        return None, True
+    except (requests.exceptions.RequestException, ValueError) as e:
         logger.error(f"Error resolving DOI {doi}: {e}")
-    return None
+        return None, False
+
+def resolve_dois(dois: List[str], max_workers: int = None) -> Dict[str, Optional[str]]:
+    """
+    Resolves many DOIs at once. DOIs are deduplicated case-insensitively, answered from the
+    persistent DOI cache where possible, and the rest are looked up concurrently. Resolved URLs
+    and definitive failures are written back to the cache.
+    Returns {doi: url or None} keyed by the DOIs as given.
+    """
+    requested = {doi: normalize_doi(doi) for doi in dois if doi}
+    unique_dois = list(dict.fromkeys(d for d in requested.values() if d))
+    if not unique_dois:
+        return {}
+
+    cache = get_doi_cache()
+    resolved = cache.get_many(unique_dois) if cache else {}
+    cache_hits = len(resolved)
+    missing_dois = [d for d in unique_dois if d not in resolved]
+    if missing_dois:
+        max_workers = max_workers or settings.HTTP_FETCH_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing_dois))) as executor:
+            lookups = list(executor.map(_lookup_doi, missing_dois))
+        definitive = {}
+        for doi, (url, is_definitive) in zip(missing_dois, lookups):
+            resolved[doi] = url
+            if is_definitive:
+                definitive[doi] = url
+        if cache:
+            cache.set_many(definitive)
+    logger.info(f"Resolved {sum(1 for url in resolved.values() if url)} of {len(unique_dois)} DOIs ({cache_hits} from cache).")
+    return {doi: resolved.get(normalized) for doi, normalized in requested.items()}
+
+def resolve_doi_to_url(doi: str) -> Optional[str]:
+    """Resolves a DOI to its primary URL using CrossRef API, via the DOI cache."""
+    if not doi:
+        return None
+    return resolve_dois([doi]).get(doi)
 
 # Consider integrating with Semantic Scholar API or similar for richer URL/DOI processing
 # Example: Using Semantic Scholar Python client (install `semanticscholar`)